@@ -0,0 +1,239 @@
+"""
+LLM Admission Control
+Bounds concurrent LLM calls with a global slot pool shared fairly between
+users (start-time fair queuing), and rate-limits the LLM turns of each user
+with token buckets so a few heavy users cannot starve everyone else
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Concurrent LLM calls across all users
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Waiting LLM calls beyond which new chat requests are rejected with 429
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "256"))
+# Sustained LLM turns per second per user (0, the default, disables the limit), and
+# burst size; cache hits and fast-path commands are not counted
+CHAT_USER_RATE = float(os.getenv("CHAT_USER_RATE", "0"))
+CHAT_USER_BURST = float(os.getenv("CHAT_USER_BURST", "10"))
+# Queue share of background LLM work (conversation summaries) relative to a user
+LLM_BACKGROUND_WEIGHT = float(os.getenv("LLM_BACKGROUND_WEIGHT", "0.25"))
+# Seconds between SSE "queued" events while a stream waits for a slot
+LLM_QUEUE_EVENT_INTERVAL = float(os.getenv("LLM_QUEUE_EVENT_INTERVAL", "1"))
+
+# Idle per-user state is pruned once this many users are tracked
+_MAX_TRACKED_USERS = 4096
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when a turn needs the LLM while the user's token bucket is empty."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many chat requests. Please try again shortly.")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A claim on one LLM slot; granted immediately or once it reaches the head of the queue."""
+
+    __slots__ = ("key", "tag", "order", "future", "enqueued_at", "granted_at", "done")
+
+    def __init__(self, key: Hashable, tag: float, order: int, future: asyncio.Future):
+        self.key = key
+        self.tag = tag
+        self.order = order
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.done = False
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+    @property
+    def wait_ms(self) -> float:
+        """Time spent queued before the slot was granted."""
+        return ((self.granted_at or time.monotonic()) - self.enqueued_at) * 1000
+
+
+class AdmissionGovernor:
+    def __init__(
+        self,
+        concurrency: int = LLM_MAX_CONCURRENCY,
+        queue_max: int = LLM_QUEUE_MAX,
+        user_rate: float = CHAT_USER_RATE,
+        user_burst: float = CHAT_USER_BURST,
+    ):
+        self.concurrency = concurrency
+        self.queue_max = queue_max
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.in_flight = 0
+        self.queued = 0
+        # (start tag, arrival order, ticket); cancelled tickets are skipped lazily
+        self._heap: List[Tuple[float, int, Ticket]] = []
+        self._order = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[Hashable, float] = {}
+        self._buckets: Dict[int, List[float]] = {}
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._hold_seconds = 1.0
+        self._waits_ms = deque(maxlen=1024)
+        self.counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "granted": 0, "waited": 0}
+
+    # Request admission
+
+    def admit(self, user_id: int) -> Optional[float]:
+        """
+        Admit a chat request while the LLM queue has room.
+
+        Returns None when admitted, otherwise the seconds after which the
+        client should retry. The user's rate is charged separately, once the
+        turn turns out to need the LLM (see charge).
+        """
+        if self.queued >= self.queue_max:
+            self.counters["queue_full"] += 1
+            return max(1.0, self.queued / max(self.concurrency, 1) * self._hold_seconds)
+        self.counters["admitted"] += 1
+        return None
+
+    def charge(self, user_id: int) -> Optional[float]:
+        """
+        Take a token from the user's bucket for a turn that calls the LLM.
+
+        Returns None when the user is within their rate, otherwise the
+        seconds after which the client should retry.
+        """
+        if self.user_rate <= 0:
+            return None
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_TRACKED_USERS:
+                self._prune_buckets(now)
+            bucket = self._buckets[user_id] = [self.user_burst, now]
+        tokens = min(self.user_burst, bucket[0] + (now - bucket[1]) * self.user_rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            self.counters["rate_limited"] += 1
+            return (1 - tokens) / self.user_rate
+        bucket[0] = tokens - 1
+        return None
+
+    def _prune_buckets(self, now: float) -> None:
+        for user_id, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.user_rate >= self.user_burst:
+                del self._buckets[user_id]
+
+    # LLM slots
+
+    def enqueue(self, key: Hashable, weight: float = 1.0) -> Ticket:
+        """
+        Claim a slot for one LLM call on behalf of key (a user ID).
+
+        Waiting calls are served in order of their start tag: a key's calls
+        are spaced 1/weight apart in virtual time, so a user with many calls
+        queued cannot push back the next call of another user.
+        """
+        start = max(self._virtual_time, self._finish_tags.get(key, 0.0))
+        if len(self._finish_tags) >= _MAX_TRACKED_USERS:
+            self._finish_tags = {k: v for k, v in self._finish_tags.items() if v > self._virtual_time}
+        self._finish_tags[key] = start + 1.0 / weight
+
+        ticket = Ticket(key, start, next(self._order), asyncio.get_running_loop().create_future())
+        if self.in_flight < self.concurrency and not self.queued:
+            self.in_flight += 1
+            self._grant(ticket)
+        else:
+            self.queued += 1
+            heapq.heappush(self._heap, (start, ticket.order, ticket))
+        return ticket
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted_at = time.monotonic()
+        self._virtual_time = max(self._virtual_time, ticket.tag)
+        wait_ms = ticket.wait_ms
+        self._waits_ms.append(wait_ms)
+        self.counters["granted"] += 1
+        if wait_ms >= 1:
+            self.counters["waited"] += 1
+        if not ticket.future.done():
+            ticket.future.set_result(None)
+
+    async def wait(self, ticket: Ticket, timeout: Optional[float] = None) -> bool:
+        """Wait until the ticket is granted; False if the timeout expired first."""
+        if ticket.granted:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based queue position of a waiting ticket, 0 once granted."""
+        if ticket.granted:
+            return 0
+        return 1 + sum(
+            1 for tag, order, other in self._heap
+            if not other.done and (tag, order) < (ticket.tag, ticket.order)
+        )
+
+    def release(self, ticket: Ticket) -> None:
+        """Give the slot back (or abandon the wait); safe to call more than once."""
+        if ticket.done:
+            return
+        ticket.done = True
+        if not ticket.granted:
+            # Left the queue, e.g. the client disconnected; the heap entry is skipped later
+            self.queued -= 1
+            ticket.future.cancel()
+            return
+
+        held = time.monotonic() - ticket.granted_at
+        self._hold_seconds += 0.1 * (held - self._hold_seconds)
+        while self._heap:
+            _, _, waiting = heapq.heappop(self._heap)
+            if waiting.done:
+                continue
+            # Hand the slot straight to the next waiter
+            self.queued -= 1
+            self._grant(waiting)
+            return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, weight: float = 1.0):
+        """Hold an LLM slot for the duration of the block."""
+        ticket = self.enqueue(key, weight)
+        try:
+            await self.wait(ticket)
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "concurrency": self.concurrency,
+            "queue_wait_ms": {
+                "mean": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, math.ceil(len(waits) * 0.95) - 1)], 2) if waits else 0.0,
+                "max": round(waits[-1], 2) if waits else 0.0,
+            },
+        }
+
+
+governor = AdmissionGovernor()
@@ -3,28 +3,71 @@ AI Agent for Todo Application using OpenAI SDK with OpenRouter
 Handles natural language task management through function calling
 """
 
+import asyncio
 import os
 import json
-from typing import List
+import time
+from contextlib import asynccontextmanager
+from typing import Any, List, Optional, Tuple
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
+
+import mcp_server  # noqa: F401  (registers the todo tools)
+import metrics
+import response_cache
+from admission import RateLimitedError, governor
+from intent import INTENT_FASTPATH, parse_intent, render_reply
+from database import release_turn_session, turn_session
+from tool_registry import registry
+from turn_trace import TurnTrace
 
 load_dotenv()
 
-# Validate OPEN_ROUTER_KEY
-OPEN_ROUTER_KEY = os.getenv("OPEN_ROUTER_KEY")
-if not OPEN_ROUTER_KEY:
-    raise ValueError("OPEN_ROUTER_KEY environment variable is not set")
+# "openrouter" (default) or "fake" for the offline stand-in in fake_llm.py
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openrouter").lower()
+
+if LLM_BACKEND == "fake":
+    from fake_llm import FakeLLM
+
+    client = FakeLLM()
+else:
+    # Validate OPEN_ROUTER_KEY
+    OPEN_ROUTER_KEY = os.getenv("OPEN_ROUTER_KEY")
+    if not OPEN_ROUTER_KEY:
+        raise ValueError("OPEN_ROUTER_KEY environment variable is not set")
+
+    # OpenRouter client with a shared connection pool, timeouts, retries and
+    # a circuit breaker (see llm_client.py)
+    from llm_client import ResilientLLMClient
+
+    client = ResilientLLMClient(api_key=OPEN_ROUTER_KEY)
+
+# Latency, time to first token and token usage of every completion
+client = metrics.instrument_llm(client)
+if metrics.METRICS:
+    registry.add_timing_hook(metrics.observe_tool)
+
+
+def llm_client_stats() -> dict:
+    """Retry, hedging and circuit-breaker counters of the LLM client."""
+    if hasattr(client, "stats"):
+        return {"backend": LLM_BACKEND, **client.stats()}
+    return {"backend": LLM_BACKEND}
 
-# Configure OpenAI client for OpenRouter
-client = AsyncOpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPEN_ROUTER_KEY,
-)
 
 # Model to use
 MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")
 
+# Maximum number of tool calls executed concurrently within one round
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+
+# Tool rounds per turn; the completion after the last one may not call tools
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "8"))
+# Reply when the model still asks for tools once the rounds are used up
+TOOL_ROUNDS_EXHAUSTED_REPLY = (
+    "I couldn't finish that within the allowed number of steps. "
+    "Please try again with a more specific request."
+)
+
 # Agent system instructions
 SYSTEM_PROMPT = """You are a helpful todo management assistant. You help users manage their tasks through natural conversation.
 
@@ -47,6 +90,7 @@ You can help users with:
 - When user asks for summary/overview/statistics/report, use the get_task_summary function
 - When user asks for insights/suggestions/tips/productivity advice, use the get_productivity_insights function
 - When user asks "how am I doing" or about their progress, use get_productivity_insights
+- When user adds, completes or deletes several tasks at once, use add_tasks, complete_tasks or delete_tasks in a single call instead of one call per task
 
 ## Response Style:
 - Be conversational and friendly
@@ -61,186 +105,188 @@ You can help users with:
 ## Important:
 - The user_id will be automatically injected - you don't need to ask for it
 - Never make up task IDs - always get them from list_tasks first if needed
+- list_tasks returns one page of tasks; when next_after is set, call it again with after=next_after only if you need more
 - When a user refers to a task by name or description, find its ID first
 """
 
-# Tool definitions for OpenAI function calling
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "add_task",
-            "description": "Create a new task for the user",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "title": {
-                        "type": "string",
-                        "description": "The task title/content"
-                    },
-                    "description": {
-                        "type": "string",
-                        "description": "Optional task description"
-                    }
-                },
-                "required": ["title"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_tasks",
-            "description": "Retrieve tasks from the user's list",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "status": {
-                        "type": "string",
-                        "enum": ["all", "pending", "completed"],
-                        "description": "Filter by status: all, pending, or completed. Default is all."
-                    }
-                },
-                "required": []
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "complete_task",
-            "description": "Mark a task as complete",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "task_id": {
-                        "type": "integer",
-                        "description": "The task ID to complete"
-                    }
-                },
-                "required": ["task_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "delete_task",
-            "description": "Delete a task",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "task_id": {
-                        "type": "integer",
-                        "description": "The task ID to delete"
-                    }
-                },
-                "required": ["task_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "update_task",
-            "description": "Update a task's title or completion status",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "task_id": {
-                        "type": "integer",
-                        "description": "The task ID to update"
-                    },
-                    "title": {
-                        "type": "string",
-                        "description": "New task title"
-                    },
-                    "completed": {
-                        "type": "boolean",
-                        "description": "Task completion status"
-                    }
-                },
-                "required": ["task_id"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_task_summary",
-            "description": "Get a comprehensive summary and statistics of the user's tasks including completion rates and task breakdown",
-            "parameters": {
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_productivity_insights",
-            "description": "Get productivity insights and smart suggestions based on task patterns",
-            "parameters": {
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        }
-    }
-]
+# Tool definitions for OpenAI function calling, generated from the shared registry
+TOOLS = registry.openai_tools()
+
+
+def decode_tool_arguments(raw: Optional[str]) -> Any:
+    """
+    Decode the JSON arguments of a tool call. Malformed JSON is passed on
+    unchanged: the registry then answers with an error result the model can
+    correct in its next round, instead of failing the whole turn.
+    """
+    try:
+        return json.loads(raw or "{}")
+    except json.JSONDecodeError:
+        return raw
+
+
+def tool_choice(tool_rounds: List[dict]) -> str:
+    """Let the model call tools until the turn has used MAX_TOOL_ROUNDS rounds."""
+    return "auto" if len(tool_rounds) < MAX_TOOL_ROUNDS else "none"
 
 
 async def execute_tool(tool_name: str, arguments: dict, user_id: int) -> dict:
     """Execute a tool and return the result."""
-    from mcp_server import (
-        add_task, list_tasks, complete_task, delete_task, update_task,
-        get_task_summary, get_productivity_insights
-    )
-
-    user_id_str = str(user_id)
-
-    if tool_name == "add_task":
-        return await add_task(
-            user_id=user_id_str,
-            title=arguments.get("title", ""),
-            description=arguments.get("description", "")
-        )
-    elif tool_name == "list_tasks":
-        return await list_tasks(
-            user_id=user_id_str,
-            status=arguments.get("status", "all")
-        )
-    elif tool_name == "complete_task":
-        return await complete_task(
-            user_id=user_id_str,
-            task_id=arguments.get("task_id")
-        )
-    elif tool_name == "delete_task":
-        return await delete_task(
-            user_id=user_id_str,
-            task_id=arguments.get("task_id")
-        )
-    elif tool_name == "update_task":
-        return await update_task(
-            user_id=user_id_str,
-            task_id=arguments.get("task_id"),
-            title=arguments.get("title"),
-            completed=arguments.get("completed")
-        )
-    elif tool_name == "get_task_summary":
-        return await get_task_summary(user_id=user_id_str)
-    elif tool_name == "get_productivity_insights":
-        return await get_productivity_insights(user_id=user_id_str)
-    else:
-        return {"error": f"Unknown tool: {tool_name}"}
+    return await registry.call(tool_name, arguments, user_id)
+
+
+def plan_tool_batches(tool_calls: List[Tuple[str, dict]]) -> List[List[int]]:
+    """
+    Split one round of tool calls into batches that may run concurrently.
+
+    Consecutive reads share a batch, and so do consecutive writes to distinct
+    tasks. Switching between reads and writes, or writing a task twice, starts
+    a new batch, so every dependency keeps the order the model asked for.
+    """
+    batches: List[List[int]] = []
+    batch_is_read = None
+    batch_tasks: set = set()
+
+    for index, (tool_name, arguments) in enumerate(tool_calls):
+        is_read = registry.is_read_only(tool_name)
+        task_ids = set()
+        if not is_read and isinstance(arguments, dict):
+            if arguments.get("task_id") is not None:
+                task_ids.add(arguments["task_id"])
+            # Batch tools write every task in their task_ids list
+            if isinstance(arguments.get("task_ids"), list):
+                task_ids.update(
+                    task_id for task_id in arguments["task_ids"]
+                    if isinstance(task_id, (int, str))
+                )
+        if (
+            not batches
+            or is_read != batch_is_read
+            or task_ids & batch_tasks
+        ):
+            batches.append([])
+            batch_is_read = is_read
+            batch_tasks = set()
+        batches[-1].append(index)
+        batch_tasks |= task_ids
+
+    return batches
+
+
+@asynccontextmanager
+async def agent_turn():
+    """Scope of one agent turn: its tool calls share a database session and a read cache."""
+    async with turn_session():
+        with registry.read_cache():
+            yield
+
+
+async def execute_tool_calls(
+    tool_calls: List[Tuple[str, dict]],
+    user_id: int
+) -> Tuple[List[dict], dict]:
+    """
+    Execute one round of tool calls, running independent calls concurrently.
+
+    Args:
+        tool_calls: (tool_name, arguments) pairs in the order the model issued them
+        user_id: The authenticated user's ID
+
+    Returns:
+        The results in call order, and the latency breakdown of the round
+    """
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+    results: List[dict] = [None] * len(tool_calls)
+    timings: List[dict] = [None] * len(tool_calls)
+
+    async def run(index: int):
+        tool_name, arguments = tool_calls[index]
+        async with semaphore:
+            started = time.perf_counter()
+            results[index] = await execute_tool(tool_name, arguments, user_id)
+            timings[index] = {
+                "tool": tool_name,
+                "ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+
+    round_started = time.perf_counter()
+    batches = plan_tool_batches(tool_calls)
+    try:
+        for batch in batches:
+            await asyncio.gather(*(run(index) for index in batch))
+    finally:
+        # Hand the turn session's connection back to the pool before the next LLM call
+        await release_turn_session()
+
+    return results, {
+        "wall_ms": round((time.perf_counter() - round_started) * 1000, 2),
+        "batches": len(batches),
+        "tools": timings
+    }
+
+
+def is_cacheable_turn(tool_rounds: List[dict]) -> bool:
+    """A response may be cached when its turn called tools and all of them were read-only."""
+    tool_names = [timing["tool"] for round_timing in tool_rounds for timing in round_timing["tools"]]
+    return bool(tool_names) and all(registry.is_read_only(name) for name in tool_names)
+
+
+async def run_fastpath(
+    user_id: int,
+    message: str,
+    trace: Optional[TurnTrace] = None
+) -> Optional[Tuple[str, dict]]:
+    """
+    Execute a simple command without the LLM.
+
+    Returns:
+        The templated reply and response metadata, or None when the message
+        is not a command the intent parser is confident about
+    """
+    intent = parse_intent(message) if INTENT_FASTPATH else None
+    if intent is None:
+        return None
+    calls = [(intent.tool, intent.arguments)]
+    async with agent_turn():
+        results, round_timing = await execute_tool_calls(calls, user_id)
+    if trace is not None:
+        trace.source = "fastpath"
+        trace.add_tool_round(calls, results, round_timing)
+    return render_reply(intent, results[0]), {"tool_rounds": [round_timing], "fastpath": intent.name}
+
+
+def build_messages(
+    message: str,
+    conversation_history: List[dict],
+    summary: Optional[str] = None
+) -> List[dict]:
+    """Build the prompt: system prompt, summary of older turns, history and the new message."""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    if summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary}"
+        })
+
+    # Add conversation history
+    for msg in conversation_history:
+        role = msg.get("role", "user")
+        content = msg.get("content", "")
+        messages.append({"role": role, "content": content})
+
+    # Add new user message
+    messages.append({"role": "user", "content": message})
+    return messages
 
 
 async def run_agent(
     user_id: int,
     message: str,
-    conversation_history: List[dict]
-) -> str:
+    conversation_history: List[dict],
+    summary: Optional[str] = None,
+    trace: Optional[TurnTrace] = None
+) -> Tuple[str, dict]:
     """
     Run the AI agent with the given message and history.
 
@@ -248,61 +294,92 @@ async def run_agent(
         user_id: The authenticated user's ID
         message: The new user message
         conversation_history: List of previous messages in the conversation
+        summary: Rolling summary of turns older than the history window
+        trace: Receives the LLM calls and tool rounds of the turn
 
     Returns:
-        The assistant's response string
+        The assistant's response string, and metadata with the latency
+        breakdown of every tool round
     """
+    # Answers to read-only questions only depend on the user's tasks
+    if trace is None:
+        trace = TurnTrace(MODEL)
+
+    cached = response_cache.lookup(user_id, message)
+    if cached is not None:
+        trace.source = "cache"
+        return cached, {"tool_rounds": [], "cache": "hit"}
+    state_version = response_cache.state_version(user_id)
+
+    tool_rounds: List[dict] = []
     try:
-        # Build messages array
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-        # Add conversation history
-        for msg in conversation_history:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            messages.append({"role": role, "content": content})
-
-        # Add new user message
-        messages.append({"role": "user", "content": message})
-
-        # Initial API call
-        response = await client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto",
-        )
+        fastpath = await run_fastpath(user_id, message, trace)
+        if fastpath is not None:
+            return fastpath
+
+        async def complete(messages: List[dict]):
+            started = time.perf_counter()
+            async with governor.slot(user_id) as ticket:
+                response = await client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    tools=TOOLS,
+                    tool_choice=tool_choice(tool_rounds),
+                )
+            trace.add_llm_call(started, ticket.wait_ms, response.usage, response.choices[0].finish_reason)
+            return response
+
+        # Only turns that reach the LLM count against the user's rate
+        retry_after = governor.charge(user_id)
+        if retry_after is not None:
+            raise RateLimitedError(retry_after)
+
+        async with agent_turn():
+            # Build messages array
+            messages = build_messages(message, conversation_history, summary)
+
+            # Initial API call
+            response = await complete(messages)
 
-        # Handle tool calls in a loop
-        while response.choices[0].message.tool_calls:
-            assistant_message = response.choices[0].message
-            messages.append(assistant_message)
-
-            # Process each tool call
-            for tool_call in assistant_message.tool_calls:
-                tool_name = tool_call.function.name
-                arguments = json.loads(tool_call.function.arguments)
-
-                # Execute the tool
-                result = await execute_tool(tool_name, arguments, user_id)
-
-                # Add tool result to messages
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(result)
-                })
-
-            # Get next response
-            response = await client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                tools=TOOLS,
-                tool_choice="auto",
-            )
-
-        # Return the final text response
-        return response.choices[0].message.content or "I've completed your request."
+            # Handle tool calls in a loop
+            while response.choices[0].message.tool_calls:
+                if len(tool_rounds) >= MAX_TOOL_ROUNDS:
+                    # The model kept calling tools after they were turned off
+                    return TOOL_ROUNDS_EXHAUSTED_REPLY, {"tool_rounds": tool_rounds}
+                assistant_message = response.choices[0].message
+                messages.append(assistant_message)
 
+                # Execute the round, independent calls concurrently
+                calls = [
+                    (tool_call.function.name, decode_tool_arguments(tool_call.function.arguments))
+                    for tool_call in assistant_message.tool_calls
+                ]
+                results, round_timing = await execute_tool_calls(calls, user_id)
+                tool_rounds.append(round_timing)
+                trace.add_tool_round(calls, results, round_timing)
+
+                # Add tool results to messages, in the order they were requested
+                for tool_call, result in zip(assistant_message.tool_calls, results):
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "content": json.dumps(result)
+                    })
+
+                # Get next response
+                response = await complete(messages)
+
+            # Return the final text response
+            content = response.choices[0].message.content or "I've completed your request."
+            if is_cacheable_turn(tool_rounds):
+                response_cache.store(user_id, message, content, state_version)
+            return content, {"tool_rounds": tool_rounds}
+
+    except RateLimitedError:
+        raise
     except Exception as e:
-        return f"I'm sorry, I encountered an error: {str(e)}. Please try again."
+        trace.error = str(e)
+        return (
+            f"I'm sorry, I encountered an error: {str(e)}. Please try again.",
+            {"tool_rounds": tool_rounds}
+        )
@@ -1,14 +1,21 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlmodel import Session, select
+from sqlalchemy import event, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 import bcrypt
 import os
 
-from database import get_session
+from database import begin_write, get_session
 from models import User
 
 # Configuration
@@ -18,46 +25,199 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Password hashing: bcrypt work factor and the dedicated worker pool it runs in
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Principal cache: decoded tokens -> User snapshots, so authenticated requests
+# can skip the per-request user lookup
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "1024"))
+# Embed user_id/disabled claims in new tokens so cache misses need no DB hit.
+# Revocation window: a process sees users it changed itself at once, but other
+# workers only learn that a user was disabled from the DB. They trust embedded
+# claims for JWT_CLAIMS_MAX_AGE_SECONDS after the token was issued, then check
+# the DB like for any token (whose principal they cache for
+# PRINCIPAL_CACHE_TTL_SECONDS), so a disabled user keeps access for at most
+# the longer of the two.
+JWT_EMBED_CLAIMS = os.environ.get("JWT_EMBED_CLAIMS", "false").lower() in ("1", "true", "yes")
+JWT_CLAIMS_MAX_AGE_SECONDS = int(os.environ.get("JWT_CLAIMS_MAX_AGE_SECONDS", "300"))
+
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop without the pickling overhead of a process pool.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_hash_in_flight = 0
+_hash_rejected = 0
+
+
+async def _run_hash_job(func, *args):
+    """Run a bcrypt call on the hashing pool, shedding load once the queue is full."""
+    global _hash_in_flight, _hash_rejected
+    if _hash_in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        _hash_rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _hash_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+def password_hash_stats() -> dict:
+    """Snapshot of the hashing pool for metrics endpoints."""
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "in_flight": _hash_in_flight,
+        "queued": max(0, _hash_in_flight - PASSWORD_HASH_WORKERS),
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "rejected": _hash_rejected,
+    }
+
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def _hashpw(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash_job(_checkpw, plain_password, hashed_password)
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run_hash_job(_hashpw, password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when the stored hash was produced with a different work factor."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+# token hash -> (expires_at, User snapshot), kept in LRU order
+_principal_cache: "OrderedDict[str, tuple[float, User]]" = OrderedDict()
+_principal_keys_by_user: dict[int, set[str]] = {}
+# user id -> time of the last change, used to distrust older embedded claims
+_user_changed_at: dict[int, float] = {}
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _snapshot(user: User) -> User:
+    """Detached copy of a user that is safe to share between requests."""
+    return User(**user.model_dump())
+
+
+def _cache_get(key: str) -> Optional[User]:
+    entry = _principal_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at <= time.time():
+        _cache_drop(key)
+        return None
+    _principal_cache.move_to_end(key)
+    return user
+
+
+def _cache_drop(key: str) -> None:
+    entry = _principal_cache.pop(key, None)
+    if entry is not None:
+        keys = _principal_keys_by_user.get(entry[1].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _principal_keys_by_user[entry[1].id]
+
+
+def _cache_put(key: str, user: User, token_exp: Optional[float]) -> None:
+    expires_at = time.time() + PRINCIPAL_CACHE_TTL_SECONDS
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+    _principal_cache[key] = (expires_at, user)
+    _principal_cache.move_to_end(key)
+    _principal_keys_by_user.setdefault(user.id, set()).add(key)
+    while len(_principal_cache) > PRINCIPAL_CACHE_SIZE:
+        _cache_drop(next(iter(_principal_cache)))
+
+
+def invalidate_user(user_id: int) -> None:
+    """Forget cached principals of a user after it was changed or disabled."""
+    for key in list(_principal_keys_by_user.get(user_id, ())):
+        _cache_drop(key)
+    _user_changed_at[user_id] = time.time()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    if target.id is not None:
+        invalidate_user(target.id)
+
+
+def create_access_token(
+    data: dict, expires_delta: Optional[timedelta] = None, user: Optional[User] = None
+):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    if JWT_EMBED_CLAIMS and user is not None:
+        to_encode.update({"uid": user.id, "disabled": user.disabled, "iat": int(time.time())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def authenticate_user(session: Session, username: str, password: str):
-    user = session.exec(select(User).where(User.username == username)).first()
+async def authenticate_user(session: AsyncSession, username: str, password: str):
+    user = (await session.exec(select(User).where(User.username == username))).first()
+    # End the read transaction and hand the connection back before bcrypt runs
+    await session.close()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
+    # Transparently upgrade hashes when BCRYPT_ROUNDS changes
+    if password_needs_rehash(user.hashed_password):
+        hashed_password = await get_password_hash(password)
+        await begin_write(session)
+        await session.exec(update(User).where(User.id == user.id).values(hashed_password=hashed_password))
+        await session.commit()
+        user.hashed_password = hashed_password
     return user
 
 
 async def get_current_user(
-    session: Session = Depends(get_session), token: str = Depends(oauth2_scheme)
+    session: AsyncSession = Depends(get_session), token: str = Depends(oauth2_scheme)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    key = _token_key(token)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -65,9 +225,33 @@ async def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = session.exec(select(User).where(User.username == username)).first()
-    if user is None:
+
+    uid = payload.get("uid")
+    issued_at = payload.get("iat", 0)
+    claims_expire_at = issued_at + JWT_CLAIMS_MAX_AGE_SECONDS
+    if (
+        uid is not None
+        and "disabled" in payload
+        and _user_changed_at.get(uid, 0) < issued_at
+        and time.time() < claims_expire_at
+    ):
+        # Claims-only principal: enough for authorization, no DB round-trip
+        user = User(
+            id=uid,
+            username=username,
+            email="",
+            hashed_password="",
+            disabled=bool(payload["disabled"]),
+        )
+        # Cached no longer than the claims are trusted
+        _cache_put(key, user, min(payload.get("exp", claims_expire_at), claims_expire_at))
+        return user
+
+    db_user = (await session.exec(select(User).where(User.username == username))).first()
+    if db_user is None:
         raise credentials_exception
+    user = _snapshot(db_user)
+    _cache_put(key, user, payload.get("exp"))
     return user
 
 
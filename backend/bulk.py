@@ -0,0 +1,152 @@
+"""
+Bulk Todo Operations
+Set-based create/update/delete shared by the REST bulk endpoints and the MCP batch tools
+"""
+
+import os
+from typing import Dict, List, Optional
+from sqlalchemy import delete, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Todo
+from stats import apply_task_delta
+
+# Maximum number of todos accepted by one bulk request or batch tool call
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+
+async def owned_completion(
+    session: AsyncSession,
+    user_id: int,
+    todo_ids: List[int]
+) -> Dict[int, bool]:
+    """Map each of the given todo IDs owned by the user to its completion state."""
+    if not todo_ids:
+        return {}
+    query = select(Todo.id, Todo.completed).where(
+        Todo.user_id == user_id,
+        Todo.id.in_(todo_ids)
+    )
+    return dict((await session.exec(query)).all())
+
+
+async def fetch_todos(session: AsyncSession, todo_ids: List[int]) -> List[Todo]:
+    """Reload todos after a bulk statement, bypassing stale identity-map copies."""
+    query = select(Todo).where(Todo.id.in_(todo_ids)).order_by(Todo.id)
+    return (await session.exec(query.execution_options(populate_existing=True))).all()
+
+
+async def create_todos(session: AsyncSession, user_id: int, contents: List[str]) -> List[Todo]:
+    """Insert many todos with one executemany INSERT ... RETURNING, without committing."""
+    if not contents:
+        return []
+    rows = [{"content": content, "user_id": user_id, "completed": False} for content in contents]
+    todos = (await session.exec(insert(Todo).returning(Todo), params=rows)).scalars().all()
+    await apply_task_delta(session, user_id, total=len(todos))
+    return todos
+
+
+async def update_todos(
+    session: AsyncSession,
+    user_id: int,
+    changes: List[dict],
+    owned: Dict[int, bool]
+) -> None:
+    """
+    Apply per-todo changes ({"id", optional "content", optional "completed"}), without committing.
+
+    Args:
+        owned: Result of owned_completion() for the changed IDs; changes to
+            other IDs are ignored
+    """
+    # Merge repeated IDs so each todo is written, and counted, once
+    merged: Dict[int, dict] = {}
+    for change in changes:
+        if change["id"] in owned:
+            merged.setdefault(change["id"], {"id": change["id"]}).update(
+                {key: value for key, value in change.items() if value is not None}
+            )
+
+    if not any(len(row) > 1 for row in merged.values()):
+        return
+
+    # ORM bulk UPDATE by primary key, executed as executemany
+    content_rows = [{"id": row["id"], "content": row["content"]} for row in merged.values() if "content" in row]
+    if content_rows:
+        await session.exec(update(Todo), params=content_rows)
+    completed_delta = 0
+    for completed in (True, False):
+        todo_ids = [row["id"] for row in merged.values() if row.get("completed") is completed]
+        completed_delta += await _set_completed(session, user_id, todo_ids, completed)
+    await apply_task_delta(session, user_id, completed=completed_delta)
+
+
+async def _set_completed(session: AsyncSession, user_id: int, todo_ids: List[int], completed: bool) -> int:
+    """
+    Set the completion state of the user's todos; returns the change to the
+    completed counter.
+
+    The delta is the UPDATE's row count rather than a state read beforehand,
+    so concurrent writers completing the same todo count it once.
+    """
+    if not todo_ids:
+        return 0
+    result = await session.exec(
+        update(Todo)
+        .where(Todo.user_id == user_id, Todo.id.in_(list(todo_ids)), Todo.completed != completed)
+        .values(completed=completed)
+    )
+    return result.rowcount if completed else -result.rowcount
+
+
+async def set_todos_completed(
+    session: AsyncSession,
+    user_id: int,
+    todo_ids: List[int],
+    completed: bool = True
+) -> int:
+    """
+    Set the completion state of many owned todos with one UPDATE, without
+    committing; returns how many changed state.
+    """
+    completed_delta = await _set_completed(session, user_id, todo_ids, completed)
+    await apply_task_delta(session, user_id, completed=completed_delta)
+    return abs(completed_delta)
+
+
+async def delete_todos(
+    session: AsyncSession,
+    user_id: int,
+    todo_ids: List[int]
+) -> int:
+    """
+    Delete many owned todos with one DELETE, without committing; returns how
+    many were deleted.
+
+    The counter deltas come from the deleted rows (RETURNING), so a todo
+    deleted by concurrent requests is only counted once.
+    """
+    if not todo_ids:
+        return 0
+    deleted = (await session.exec(
+        delete(Todo)
+        .where(Todo.user_id == user_id, Todo.id.in_(list(todo_ids)))
+        .returning(Todo.completed)
+    )).scalars().all()
+    await apply_task_delta(
+        session,
+        user_id,
+        total=-len(deleted),
+        completed=-sum(1 for was_completed in deleted if was_completed)
+    )
+    return len(deleted)
+
+
+def check_batch_size(items: Optional[list]) -> Optional[str]:
+    """Return an error message when a batch is empty or too large."""
+    if not items:
+        return "At least one item is required"
+    if len(items) > BULK_MAX_ITEMS:
+        return f"At most {BULK_MAX_ITEMS} items can be processed at once"
+    return None
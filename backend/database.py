@@ -1,23 +1,301 @@
-from sqlmodel import create_engine, Session, SQLModel
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
 from dotenv import load_dotenv
 
+import metrics
+
 load_dotenv()
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./todos.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Opt-in SQLite production profile: WAL journal, relaxed fsync, mmap, busy
+# timeout and a larger page cache (see _apply_sqlite_pragmas)
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "false").lower() in ("1", "true", "yes")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+# Connection pool of server databases (Postgres)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before server-side idle timeouts (e.g. Neon, PgBouncer) drop them
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)."""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if backend in ("postgres", "postgresql"):
+        # asyncpg does not understand libpq's sslmode parameter
+        rest = rest.replace("sslmode=", "ssl=")
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
 
 
 # Use SQLite-specific connect_args only when using SQLite
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+if IS_SQLITE:
+    engine = create_async_engine(ASYNC_DATABASE_URL, connect_args={"check_same_thread": False})
 else:
-    engine = create_engine(DATABASE_URL)
+    engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # Let SQLAlchemy emit BEGIN itself (see _begin_sqlite_transaction), so
+    # SAVEPOINTs used by the write queue behave as documented
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Durable at each WAL checkpoint rather than each commit; safe with WAL
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    # A negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+
+# Execution option marking a connection whose transaction will write
+_BEGIN_IMMEDIATE = "sqlite_begin_immediate"
+
+
+def _begin_sqlite_transaction(connection):
+    # A deferred BEGIN takes a read snapshot at the first SELECT; under WAL,
+    # upgrading it to a write after another writer has committed fails at once
+    # with SQLITE_BUSY (busy_timeout does not apply), so writers take the
+    # write lock up front
+    if connection.get_execution_options().get(_BEGIN_IMMEDIATE):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        connection.exec_driver_sql("BEGIN")
+
+
+if IS_SQLITE and SQLITE_TUNING:
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    event.listen(engine.sync_engine, "begin", _begin_sqlite_transaction)
+
+# Pool telemetry, updated from pool events (which fire on the event loop's
+# greenlets or, for sync callers, on worker threads)
+_pool_lock = threading.Lock()
+_pool_counters = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "invalidations": 0,
+    "peak_checked_out": 0,
+    # Checkouts that left no idle connection and no overflow headroom: the
+    # next checkout has to wait for a checkin (up to DB_POOL_TIMEOUT)
+    "saturated_checkouts": 0,
+    "hold_ms_total": 0.0,
+    "hold_ms_max": 0.0,
+}
+
+
+def _on_connect(dbapi_connection, connection_record):
+    with _pool_lock:
+        _pool_counters["connects"] += 1
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+    pool = engine.sync_engine.pool
+    checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+    # QueuePool exposes no public accessor for max_overflow; -1 means unbounded
+    max_overflow = getattr(pool, "_max_overflow", -1)
+    with _pool_lock:
+        _pool_counters["checkouts"] += 1
+        _pool_counters["peak_checked_out"] = max(_pool_counters["peak_checked_out"], checked_out)
+        if max_overflow >= 0 and checked_out >= pool.size() + max_overflow:
+            _pool_counters["saturated_checkouts"] += 1
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    with _pool_lock:
+        _pool_counters["checkins"] += 1
+        if checked_out_at is not None:
+            held_ms = (time.perf_counter() - checked_out_at) * 1000
+            _pool_counters["hold_ms_total"] += held_ms
+            _pool_counters["hold_ms_max"] = max(_pool_counters["hold_ms_max"], held_ms)
+
+
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    with _pool_lock:
+        _pool_counters["invalidations"] += 1
+
+
+event.listen(engine.sync_engine.pool, "connect", _on_connect)
+event.listen(engine.sync_engine.pool, "checkout", _on_checkout)
+event.listen(engine.sync_engine.pool, "checkin", _on_checkin)
+event.listen(engine.sync_engine.pool, "invalidate", _on_invalidate)
+
+
+# Query metrics; statements are timed between the cursor execute events
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE"}
+
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    operation = words[0].upper() if words else ""
+    return operation if operation in _OPERATIONS else "OTHER"
 
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
 
 
-def get_session():
-    with Session(engine) as session:
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started, _operation(statement))
+
+
+def _on_query_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+    metrics.DB_QUERY_ERRORS.inc(_operation(exception_context.statement or ""))
+
+
+if metrics.METRICS:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _on_query_error)
+
+
+def pool_stats() -> dict:
+    """Snapshot of the connection pool for /metrics."""
+    pool = engine.sync_engine.pool
+    with _pool_lock:
+        stats = dict(_pool_counters)
+    hold_ms_total = stats.pop("hold_ms_total")
+    stats["hold_ms_avg"] = round(hold_ms_total / stats["checkins"], 2) if stats["checkins"] else 0.0
+    stats["hold_ms_max"] = round(stats["hold_ms_max"], 2)
+    stats["pool"] = type(pool).__name__
+    if hasattr(pool, "checkedout"):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": getattr(pool, "_max_overflow", -1),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    return stats
+
+
+# expire_on_commit=False so attributes stay readable after commit without
+# an implicit (and, under asyncio, illegal) lazy refresh.
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _create_missing_indexes(connection):
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def create_db_and_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        # create_all skips existing tables, including indexes added to them later
+        await conn.run_sync(_create_missing_indexes)
+
+
+async def get_session():
+    async with async_session() as session:
+        yield session
+
+
+async def begin_write(session: AsyncSession) -> None:
+    """
+    Start the session's transaction as a write transaction (BEGIN IMMEDIATE
+    with the SQLite profile); call before its first query.
+    """
+    if IS_SQLITE and SQLITE_TUNING and not session.in_transaction():
+        await session.connection(execution_options={_BEGIN_IMMEDIATE: True})
+
+
+async def get_write_session():
+    """
+    Session for handlers that read and then write. It is not shared with the
+    authentication dependency, whose reads would already have started a
+    deferred transaction; the handler calls begin_write once the request is
+    authenticated and validated.
+    """
+    async with async_session() as session:
         yield session
+
+
+class _TurnSession:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.lock = asyncio.Lock()
+
+
+# Session shared by the tool calls of the agent turn running in this context
+_turn_session: ContextVar[Optional[_TurnSession]] = ContextVar("turn_session", default=None)
+
+
+@asynccontextmanager
+async def turn_session():
+    """Share one session between all tool calls of an agent turn."""
+    async with async_session() as session:
+        token = _turn_session.set(_TurnSession(session))
+        try:
+            yield session
+        finally:
+            _turn_session.reset(token)
+
+
+@asynccontextmanager
+async def tool_session():
+    """
+    Session for a tool call: the turn's shared session when one is active and
+    idle, otherwise a fresh one (so concurrently running tools never share a
+    session, which AsyncSession does not support).
+    """
+    turn = _turn_session.get()
+    if turn is None or turn.lock.locked():
+        async with async_session() as session:
+            yield session
+        return
+
+    async with turn.lock:
+        # Rows may have been changed by tools that ran on other sessions
+        turn.session.expire_all()
+        try:
+            yield turn.session
+        except Exception:
+            await turn.session.rollback()
+            raise
+
+
+async def release_turn_session() -> None:
+    """End the shared session's transaction so its connection returns to the pool while the LLM runs."""
+    turn = _turn_session.get()
+    if turn is not None:
+        async with turn.lock:
+            await turn.session.close()
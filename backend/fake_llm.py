@@ -0,0 +1,253 @@
+"""
+Local Stand-in LLM
+Rule-based replacement for the OpenRouter client, so the agent, the streaming
+endpoint and the caches can be exercised offline (LLM_BACKEND=fake)
+
+It can also run as a mock OpenRouter HTTP server, to exercise the real client
+(llm_client.py) with injected latency and failures:
+    python fake_llm.py serve --port 8089 --fail-rate 0.2
+    LLM_BASE_URL=http://127.0.0.1:8089/v1 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, List, Optional, Tuple
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# Simulated LLM latency per completion, in milliseconds
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+
+# (pattern, tool, arguments builder), checked in order
+_INTENTS = [
+    (re.compile(r"how am i doing|insight|productiv|progress|suggest|tips?\b|advice"),
+     "get_productivity_insights", lambda m: {}),
+    (re.compile(r"summar|overview|statistic|stats\b|report"),
+     "get_task_summary", lambda m: {}),
+    (re.compile(r"\b(?:complete|done|finish(?:ed)?|mark)\b\D*(\d+)"),
+     "complete_task", lambda m: {"task_id": int(m.group(1))}),
+    (re.compile(r"\b(?:delete|remove|cancel)\b\D*(\d+)"),
+     "delete_task", lambda m: {"task_id": int(m.group(1))}),
+    (re.compile(r"\b(?:add|create|remember)\b(?:\s+(?:a\s+)?task)?(?:\s+to)?\s+(.+)"),
+     "add_task", lambda m: {"title": m.group(1).strip()}),
+    (re.compile(r"\bpending|todo\b|left|remaining"),
+     "list_tasks", lambda m: {"status": "pending"}),
+    (re.compile(r"\bcompleted|finished\b"),
+     "list_tasks", lambda m: {"status": "completed"}),
+    (re.compile(r"\b(?:show|list|tasks?)\b"),
+     "list_tasks", lambda m: {"status": "all"}),
+]
+
+
+def _field(message: Any, name: str) -> Any:
+    return message.get(name) if isinstance(message, dict) else getattr(message, name, None)
+
+
+def plan_reply(messages: List[Any]) -> Tuple[Optional[str], Optional[List[Tuple[str, dict]]]]:
+    """
+    Decide the next assistant move: (text, None) or (None, tool calls).
+
+    Tool results after the last user message are turned into a text answer;
+    otherwise the last user message is matched against the intent table.
+    """
+    last_user = max(i for i, m in enumerate(messages) if _field(m, "role") == "user")
+    tool_results = [
+        json.loads(_field(m, "content") or "{}")
+        for m in messages[last_user + 1:]
+        if _field(m, "role") == "tool"
+    ]
+    if tool_results:
+        return "\n".join(_describe(result) for result in tool_results), None
+
+    text = (_field(messages[last_user], "content") or "").lower()
+    for pattern, tool, arguments in _INTENTS:
+        match = pattern.search(text)
+        if match:
+            return None, [(tool, arguments(match))]
+    return "I can add, list, complete, update and delete your tasks. What would you like to do?", None
+
+
+def _describe(result: Any) -> str:
+    if not isinstance(result, dict):
+        return str(result)
+    if "error" in result:
+        return f"Sorry, that didn't work: {result['error']}"
+    if "tasks" in result and "status" not in result:
+        tasks = result["tasks"]
+        if not tasks:
+            return "You have no tasks here."
+        lines = [f"You have {len(tasks)} task(s):"]
+        lines += [
+            f"{i}. {task['title']}{' (done)' if task.get('completed') else ''}"
+            for i, task in enumerate(tasks, 1)
+        ]
+        return "\n".join(lines)
+    if "summary" in result:
+        s = result["summary"]
+        return (
+            f"You have {s['total_tasks']} tasks: {s['completed_tasks']} completed and "
+            f"{s['pending_tasks']} pending ({s['completion_rate']}% complete)."
+        )
+    if "insights" in result:
+        return " ".join(result["insights"] + result.get("suggestions", []))
+    if "title" in result:
+        return f"Task '{result['title']}' {result.get('status', 'updated')}."
+    return json.dumps(result)
+
+
+class _Completions:
+    def __init__(self, model: str):
+        self.model = model
+        self.calls = 0
+
+    async def create(self, messages: List[Any], stream: bool = False, model: Optional[str] = None,
+                     stream_options: Optional[dict] = None, **kwargs):
+        self.calls += 1
+        if FAKE_LLM_LATENCY_MS:
+            await asyncio.sleep(FAKE_LLM_LATENCY_MS / 1000)
+        text, tool_calls = plan_reply(messages)
+        completion_id = f"fake-{uuid.uuid4().hex[:12]}"
+        calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+            for name, arguments in tool_calls or []
+        ]
+        finish_reason = "tool_calls" if calls else "stop"
+        base = {"id": completion_id, "created": int(time.time()), "model": model or self.model}
+        # Rough token counts (about four characters per token)
+        prompt_tokens = sum(len(str(_field(m, "content") or "")) for m in messages) // 4
+        completion_tokens = (len(text or "") + sum(len(call["function"]["arguments"]) for call in calls)) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if not stream:
+            return ChatCompletion.model_validate({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": finish_reason,
+                    "message": {"role": "assistant", "content": text, "tool_calls": calls or None},
+                }],
+                "usage": usage,
+            })
+
+        def chunk(delta: dict, finish: Optional[str] = None) -> ChatCompletionChunk:
+            return ChatCompletionChunk.model_validate({
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            })
+
+        async def chunks():
+            for word in re.findall(r"\S+\s*", text or ""):
+                yield chunk({"content": word})
+            for index, call in enumerate(calls):
+                yield chunk({"tool_calls": [{"index": index, **call}]})
+            yield chunk({}, finish_reason)
+            if (stream_options or {}).get("include_usage"):
+                yield ChatCompletionChunk.model_validate({
+                    **base, "object": "chat.completion.chunk", "choices": [], "usage": usage,
+                })
+
+        return chunks()
+
+
+class _Chat:
+    def __init__(self, model: str):
+        self.completions = _Completions(model)
+
+
+class FakeLLM:
+    """Drop-in for AsyncOpenAI exposing chat.completions.create."""
+
+    def __init__(self, model: str = "fake/rules"):
+        self.chat = _Chat(model)
+
+
+def create_mock_server(fail_rate: float = 0.0, retry_after: float = 1.0,
+                       latency_ms: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 0.0):
+    """
+    FastAPI app speaking OpenRouter's /chat/completions protocol.
+
+    A fail_rate share of requests get a 429 with Retry-After; a slow_rate share
+    is delayed by slow_ms on top of latency_ms (to exercise hedging).
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Mock OpenRouter")
+    completions = _Completions("fake/rules")
+    app.state.counters = {"requests": 0, "rate_limited": 0, "slow": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.counters["requests"] += 1
+        if random.random() < fail_rate:
+            app.state.counters["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit exceeded", "code": 429}},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+        delay = latency_ms
+        if random.random() < slow_rate:
+            app.state.counters["slow"] += 1
+            delay += slow_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        result = await completions.create(
+            messages=body["messages"], stream=bool(body.get("stream")), model=body.get("model"),
+            stream_options=body.get("stream_options"),
+        )
+        if not body.get("stream"):
+            return JSONResponse(result.model_dump(exclude_none=True))
+
+        async def events():
+            async for chunk in result:
+                yield f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.counters
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stand-in LLM as a mock OpenRouter server")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added to every request")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests that are slow")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="extra latency of slow requests")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_mock_server(args.fail_rate, args.retry_after, args.latency_ms, args.slow_rate, args.slow_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
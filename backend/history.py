@@ -0,0 +1,83 @@
+"""
+Conversation history windowing for the AI agent
+Keeps the newest turns verbatim within a configurable prompt token budget
+"""
+
+import os
+from typing import List, Optional
+from sqlalchemy.orm import defer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Message
+
+# Prompt tokens available for replayed history (system prompt and tools excluded)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+# Rows fetched per LIMIT query while walking backwards through a conversation
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+# Hard cap on replayed messages, whatever their size
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "100"))
+
+# Per-message framing overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text locally, without calling the API."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # ~4 characters per token for English text with BPE tokenizers
+    return (len(text) + 3) // 4
+
+
+async def load_history_window(
+    session: AsyncSession,
+    conversation_id: int,
+    token_budget: Optional[int] = None
+) -> List[Message]:
+    """
+    Load the newest messages of a conversation that fit in the token budget.
+
+    Messages are fetched newest-first in LIMIT-ed pages, so only the tail
+    that is actually replayed is read from the database.
+
+    Returns:
+        The windowed messages in chronological order
+    """
+    budget = HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+    window: List[Message] = []
+    used = 0
+    before_id = None
+
+    while len(window) < HISTORY_MAX_MESSAGES:
+        # Turn traces in tool_calls are not replayed to the model
+        query = select(Message).options(defer(Message.tool_calls)).where(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.id.desc()).limit(HISTORY_PAGE_SIZE)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        page = (await session.exec(query)).all()
+
+        for msg in page:
+            cost = estimate_tokens(msg.content) + MESSAGE_OVERHEAD_TOKENS
+            # Always keep the latest turn, even if it alone exceeds the budget
+            if window and used + cost > budget:
+                return window[::-1]
+            window.append(msg)
+            used += cost
+            if len(window) >= HISTORY_MAX_MESSAGES:
+                break
+
+        if len(page) < HISTORY_PAGE_SIZE:
+            break
+        before_id = page[-1].id
+
+    return window[::-1]
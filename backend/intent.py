@@ -0,0 +1,192 @@
+"""
+Intent Fast Path
+Grammar-based parser for simple commands ("add buy milk", "complete task 12",
+"list pending") that are executed without an LLM round trip
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Opt-in: answer simple commands without the LLM
+INTENT_FASTPATH = os.getenv("INTENT_FASTPATH", "false").lower() in ("1", "true", "yes")
+# Intents handled by the fast path in this deployment
+INTENT_FASTPATH_INTENTS = {
+    name.strip()
+    for name in os.getenv("INTENT_FASTPATH_INTENTS", "add,complete,delete,list").split(",")
+    if name.strip()
+}
+# Longer titles are more likely to be instructions than task names
+MAX_TITLE_LENGTH = 120
+
+
+@dataclass
+class Intent:
+    name: str
+    tool: str
+    arguments: dict
+
+
+_IDS = r"(?:tasks?|todos?|items?|numbers?|no\.?)?\s*#?(?P<ids>\d+(?:\s*(?:,|and|&)\s*(?:#?\d+))*)"
+
+_COMPLETE = [
+    re.compile(rf"(?:complete|finish|close|check off|tick off|mark)\s+{_IDS}(?:\s+(?:as\s+)?(?:done|complete|completed|finished))?"),
+    re.compile(rf"(?:done with|finished)\s+{_IDS}"),
+    re.compile(rf"{_IDS}\s+(?:is\s+|are\s+)?(?:done|complete|completed|finished)"),
+]
+_DELETE = [
+    re.compile(rf"(?:delete|remove|cancel|drop|trash)\s+{_IDS}"),
+]
+_ADD = [
+    re.compile(
+        r"(?P<verb>add|create)(?P<article>\s+(?:a|an))?"
+        r"(?:\s+(?P<noun>(?:new\s+)?(?:task|todo))(?:\s+(?:to|called|named))?)?\s*:?\s+(?P<title>.+?)"
+        r"(?:\s+to\s+(?:my\s+)?(?:list|tasks|todos?|todo list))?"
+    ),
+    re.compile(r"new\s+(?:task|todo)\s*:?\s+(?P<title>.+)"),
+    re.compile(r"remind me to\s+(?P<title>.+)"),
+    re.compile(r"(?:task|todo)\s*:\s*(?P<title>.+)"),
+]
+_LIST = [
+    re.compile(
+        # A status or a noun is required: a bare "show" or "get me" is not a command
+        r"(?:list|show|display|view|get)(?:\s+me)?(?:\s+(?:my|all|all my|the))?"
+        r"(?:\s+(?P<status>pending|open|incomplete|remaining|completed|done|finished)"
+        r"(?:\s+(?:tasks|todos|items|list))?|\s+(?:tasks|todos|items|list))"
+    ),
+    re.compile(r"(?:my\s+)?(?P<status>pending|open|completed|done|finished)?\s*(?:tasks|todos)"),
+    re.compile(r"what(?:'s|\s+is|\s+are)\s+(?:my\s+)?(?P<status>pending|left|remaining|on my list)"),
+]
+
+_STATUS = {
+    "pending": "pending", "open": "pending", "incomplete": "pending", "remaining": "pending",
+    "left": "pending", "completed": "completed", "done": "completed", "finished": "completed",
+}
+# A title that only names the thing to create ("add a task")
+_TASK_NOUN = re.compile(r"(?:(?:a|an|the|my|new)\s+)*(?:tasks?|todos?|items?|reminders?)")
+# A title that refers to an existing task ("add 5 to task 3") is not a new task
+_TASK_REFERENCE = re.compile(r"\b(?:tasks?|todos?|items?|numbers?|no\.?|ids?)\s*#?\d+|#\d+")
+# A title that points back at something said earlier ("add it", "add this to the list")
+_DEICTIC = re.compile(
+    r"(?:it|this|that|these|those|them|the same)(?:\s+(?:ones?|all|both|too|as well))?"
+    r"(?:\s+(?:to|on|onto)\s+(?:the|my)\s+(?:list|tasks|todos?|todo list)|\s+as\s+(?:a\s+)?(?:task|todo)s?)?"
+)
+# Words that suggest a compound or conditional request the grammar cannot express
+_AMBIGUOUS = re.compile(r"\b(?:then|after|before|unless|if|instead|also|but|tomorrow|every|why|how)\b|\?")
+
+
+def _strip_politeness(message: str) -> str:
+    """Collapse whitespace and drop courtesy words and trailing punctuation, keeping case."""
+    text = " ".join(message.split())
+    text = re.sub(r"^(?:please|pls|hey|ok|okay)[,\s]+", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"[,\s]+(?:please|pls|thanks|thank you)$", "", text, flags=re.IGNORECASE)
+    return text.rstrip(".!? ")
+
+
+def _ids(match: re.Match) -> List[int]:
+    return list(dict.fromkeys(int(value) for value in re.findall(r"\d+", match.group("ids"))))
+
+
+def _match(patterns: List[re.Pattern], text: str) -> Optional[re.Match]:
+    for pattern in patterns:
+        match = pattern.fullmatch(text)
+        if match:
+            return match
+    return None
+
+
+def parse_intent(message: str) -> Optional[Intent]:
+    """
+    Map a simple command onto a single tool call.
+
+    Returns None unless the whole message matches one grammar, so anything
+    unusual falls back to the LLM.
+    """
+    original = _strip_politeness(message)
+    text = original.lower()
+    if not text:
+        return None
+
+    if "complete" in INTENT_FASTPATH_INTENTS:
+        match = _match(_COMPLETE, text)
+        if match:
+            ids = _ids(match)
+            if len(ids) == 1:
+                return Intent("complete", "complete_task", {"task_id": ids[0]})
+            return Intent("complete", "complete_tasks", {"task_ids": ids})
+
+    if "delete" in INTENT_FASTPATH_INTENTS:
+        match = _match(_DELETE, text)
+        if match:
+            ids = _ids(match)
+            if len(ids) == 1:
+                return Intent("delete", "delete_task", {"task_id": ids[0]})
+            return Intent("delete", "delete_tasks", {"task_ids": ids})
+
+    if "list" in INTENT_FASTPATH_INTENTS:
+        match = _match(_LIST, text)
+        if match:
+            status = _STATUS.get(match.groupdict().get("status") or "", "all")
+            return Intent("list", "list_tasks", {"status": status})
+
+    if "add" in INTENT_FASTPATH_INTENTS and not _AMBIGUOUS.search(message.lower()):
+        match = _match(_ADD, text)
+        # "create an account" or "add a column" is not about tasks unless the
+        # message says so; only "add X" may leave the task noun out
+        groups = match.groupdict() if match else {}
+        if match and not groups.get("noun") and (groups.get("verb") == "create" or groups.get("article")):
+            match = None
+        if match and (_TASK_NOUN.fullmatch(match.group("title")) or _TASK_REFERENCE.search(match.group("title"))):
+            match = None
+        # Only the conversation says what "it" is
+        if match and _DEICTIC.fullmatch(match.group("title").strip(" \"'")):
+            match = None
+        if match:
+            # Keep the user's casing for the title
+            title = match.group("title")
+            if len(original) == len(text):
+                title = original[match.start("title"):match.end("title")]
+            title = title.strip(" \"'")
+            if title and len(title) <= MAX_TITLE_LENGTH:
+                return Intent("add", "add_task", {"title": title})
+
+    return None
+
+
+def render_reply(intent: Intent, result: dict) -> str:
+    """Templated assistant reply for a fast-path tool result."""
+    if not isinstance(result, dict):
+        return str(result)
+    if "error" in result:
+        if intent.arguments.get("task_id") is not None and result["error"] in ("Task not found", "Access denied"):
+            return f"I couldn't find task {intent.arguments['task_id']}. Say \"list my tasks\" to see their IDs."
+        return f"Sorry, I couldn't do that: {result['error']}"
+
+    if intent.tool == "add_task":
+        return f"I've added '{result['title']}' to your tasks (ID {result['task_id']})."
+    if intent.tool in ("complete_task", "delete_task"):
+        verb = "marked as complete" if intent.name == "complete" else "deleted"
+        return f"Done! '{result['title']}' has been {verb}."
+    if intent.tool in ("complete_tasks", "delete_tasks"):
+        verb = "completed" if intent.name == "complete" else "deleted"
+        titles = ", ".join(f"'{task['title']}'" for task in result["tasks"]) or "nothing"
+        reply = f"Done! I've {verb} {titles}."
+        if result.get("not_found"):
+            reply += f" I couldn't find task(s) {', '.join(map(str, result['not_found']))}."
+        return reply
+
+    # list_tasks
+    tasks = result.get("tasks", [])
+    status = intent.arguments.get("status", "all")
+    label = "" if status == "all" else f"{status} "
+    if not tasks:
+        return f"You have no {label}tasks right now."
+    lines = [f"Here are your {label}tasks:"]
+    lines += [
+        f"{i}. {task['title']} (ID {task['id']}){' ✓' if task.get('completed') else ''}"
+        for i, task in enumerate(tasks, 1)
+    ]
+    if result.get("next_after") is not None:
+        lines.append("There are more — ask me to show the next page.")
+    return "\n".join(lines)
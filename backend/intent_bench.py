@@ -0,0 +1,152 @@
+"""
+Intent Fast-Path Benchmark
+Reports how much of a representative chat corpus the intent parser answers
+locally, whether it picks the right tool, and the end-to-end latency of
+run_agent with and without the fast path (against the offline stand-in LLM)
+
+Usage:
+    python intent_bench.py [--llm-latency-ms 400]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# (message, tool the fast path should pick, or None when the LLM must answer)
+CORPUS = [
+    ("add buy milk", "add_task"),
+    ("Add Call the dentist", "add_task"),
+    ("please add pick up dry cleaning", "add_task"),
+    ("add a task to renew passport", "add_task"),
+    ("create task: Prepare slides", "add_task"),
+    ("new task water the plants", "add_task"),
+    ("remind me to call Mom", "add_task"),
+    ("add eggs to my list", "add_task"),
+    ("complete task 1", "complete_task"),
+    ("complete 2", "complete_task"),
+    ("mark 3 as done", "complete_task"),
+    ("task 4 done", "complete_task"),
+    ("finish #5", "complete_task"),
+    ("complete 1, 2 and 3", "complete_tasks"),
+    ("delete 7", "delete_task"),
+    ("remove task 8", "delete_task"),
+    ("delete tasks 9 and 10", "delete_tasks"),
+    ("list pending", "list_tasks"),
+    ("show my tasks", "list_tasks"),
+    ("show me my completed tasks", "list_tasks"),
+    ("list all tasks", "list_tasks"),
+    ("my tasks", "list_tasks"),
+    ("what's pending?", "list_tasks"),
+    ("what is left", "list_tasks"),
+    ("how am I doing?", None),
+    ("give me a summary of my tasks", None),
+    ("any tips to be more productive?", None),
+    ("add milk then delete task 3", None),
+    ("rename task 4 to buy oat milk", None),
+    ("what should I focus on today?", None),
+    ("create a task to buy eggs tomorrow", None),
+    ("delete all my completed tasks", None),
+    ("hi there", None),
+    ("can you help me plan my week", None),
+    ("I finished everything from yesterday", None),
+    ("which of my tasks is the oldest", None),
+    ("add a task", None),
+    ("add task", None),
+    ("add 5 to task 3", None),
+    ("create an account for my mom on netflix", None),
+    ("add it", None),
+    ("add that", None),
+    ("add them", None),
+    ("add this to the list", None),
+    ("show", None),
+    ("get me", None),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the intent fast path")
+    parser.add_argument("--llm-latency-ms", type=float, default=400,
+                        help="simulated latency of each LLM completion")
+    return parser.parse_args()
+
+
+async def run(llm_latency_ms: float) -> None:
+    import agent
+    from database import create_db_and_tables, engine
+    from intent import parse_intent
+    from models import User
+    from write_queue import run_write, write_queue
+
+    # Parser coverage and accuracy
+    parse_times = []
+    matched = correct = false_positives = 0
+    for message, expected in CORPUS:
+        started = time.perf_counter()
+        intent = parse_intent(message)
+        parse_times.append((time.perf_counter() - started) * 1e6)
+        if intent is not None:
+            matched += 1
+            if expected is None:
+                false_positives += 1
+                print(f"  false positive: {message!r} -> {intent.tool}")
+        if (intent.tool if intent else None) == expected:
+            correct += 1
+        elif expected is not None:
+            print(f"  missed: {message!r} (expected {expected}, got {intent.tool if intent else None})")
+
+    commands = sum(1 for _, expected in CORPUS if expected)
+    print(f"corpus: {len(CORPUS)} messages, {commands} simple commands")
+    print(f"coverage: {matched}/{len(CORPUS)} answered locally, {correct}/{len(CORPUS)} routed correctly, "
+          f"{false_positives} false positive(s)")
+    print(f"parse cost: median {statistics.median(parse_times):.1f} us, max {max(parse_times):.1f} us")
+
+    # End-to-end latency with and without the fast path
+    await create_db_and_tables()
+
+    async def create_user(session):
+        user = User(username="bench", email="bench@example.com", hashed_password="-")
+        session.add(user)
+        await session.flush()
+        return user.id
+
+    user_id = await run_write(create_user)
+    for task in ("buy bread", "file taxes", "book flights", "clean garage", "pay rent",
+                 "walk dog", "read book", "fix bike", "call bank", "plan trip"):
+        await agent.registry.call("add_task", {"title": task}, user_id)
+
+    for enabled in (False, True):
+        agent.INTENT_FASTPATH = enabled
+        calls_before = agent.client.chat.completions.calls
+        latencies = []
+        for message, _ in CORPUS:
+            started = time.perf_counter()
+            await agent.run_agent(user_id, message, [])
+            latencies.append((time.perf_counter() - started) * 1000)
+        label = "fast path on " if enabled else "fast path off"
+        print(f"{label}: mean {statistics.mean(latencies):7.1f} ms/turn, "
+              f"total {sum(latencies) / 1000:6.2f} s, "
+              f"LLM calls {agent.client.chat.completions.calls - calls_before}")
+
+    await write_queue.close()
+    await engine.dispose()
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+        os.environ["RESPONSE_CACHE"] = "false"
+        os.environ.setdefault("SECRET_KEY", "bench")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        print(f"simulated LLM latency: {args.llm_latency_ms:.0f} ms per completion")
+        asyncio.run(run(args.llm_latency_ms))
+
+
+if __name__ == "__main__":
+    main()
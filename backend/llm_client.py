@@ -0,0 +1,259 @@
+"""
+Resilient LLM Client
+OpenRouter client on a shared, bounded httpx connection pool, with timeouts,
+jittered exponential retries, a circuit breaker and optional request hedging
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Shared connection pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Timeouts in seconds; read bounds the gap between two received bytes, so
+# long streamed answers are fine as long as tokens keep arriving
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_WRITE_TIMEOUT = float(os.getenv("LLM_WRITE_TIMEOUT", "10"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "10"))
+
+# Retries of 429s, 5xx responses, timeouts and connection errors
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+
+# Consecutive failed attempts that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Fire a second, identical request when the first has not answered after
+# this many milliseconds (0 disables hedging)
+LLM_HEDGE_AFTER_MS = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the LLM while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after the cooldown."""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise while open; returns True when the caller is the half-open trial."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial_in_flight):
+            raise CircuitOpenError("The AI service is temporarily unavailable. Please try again shortly.")
+        if state == "half_open":
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def _close(result: Any) -> None:
+    """Release the connection held by an unused (streaming) response."""
+    close = getattr(result, "close", None)
+    if close is not None:
+        outcome = close()
+        if asyncio.iscoroutine(outcome):
+            await outcome
+
+
+class ResilientCompletions:
+    """chat.completions facade adding retries, the circuit breaker and hedging."""
+
+    def __init__(self, completions, breaker: CircuitBreaker):
+        self._completions = completions
+        self.breaker = breaker
+        self.stats = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0,
+                      "hedges": 0, "hedge_wins": 0}
+
+    async def create(self, **kwargs) -> Any:
+        self.stats["requests"] += 1
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            self.stats["attempts"] += 1
+            try:
+                result = await self._attempt(kwargs)
+            except asyncio.CancelledError:
+                # The caller went away (e.g. an SSE client disconnected); that
+                # says nothing about the service, but the trial slot is free again
+                if trial:
+                    self.breaker.trial_in_flight = False
+                raise
+            except _RETRYABLE as e:
+                self.breaker.record_failure()
+                if attempt >= LLM_MAX_RETRIES or self.breaker.state == "open":
+                    self.stats["failures"] += 1
+                    raise
+                # Full jitter, but never earlier than the server asked for
+                delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, LLM_RETRY_MAX_DELAY))
+                attempt += 1
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # Client errors (400, 401, ...) will not succeed on retry and do
+                # not say anything about the service's health
+                if trial:
+                    self.breaker.trial_in_flight = False
+                self.stats["failures"] += 1
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _attempt(self, kwargs: dict) -> Any:
+        if LLM_HEDGE_AFTER_MS <= 0:
+            return await self._completions.create(**kwargs)
+
+        primary = asyncio.ensure_future(self._completions.create(**kwargs))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=LLM_HEDGE_AFTER_MS / 1000)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        self.stats["hedges"] += 1
+        hedge = asyncio.ensure_future(self._completions.create(**kwargs))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        # A response that completed at the same time is unused
+                        for other in done - {task}:
+                            if other.exception() is None:
+                                await _close(other.result())
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class _Chat:
+    def __init__(self, completions: ResilientCompletions):
+        self.completions = completions
+
+
+class ResilientLLMClient:
+    """Drop-in for AsyncOpenAI's chat.completions with the policies above."""
+
+    def __init__(self, api_key: str, base_url: str = LLM_BASE_URL):
+        self.http_client = build_http_client()
+        self.openai = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=self.http_client,
+            # Retries are handled by ResilientCompletions
+            max_retries=0,
+        )
+        self.breaker = CircuitBreaker()
+        self.chat = _Chat(ResilientCompletions(self.openai.chat.completions, self.breaker))
+
+    async def warm_up(self) -> None:
+        """Open a pooled connection (TCP and TLS) so the first completion does not pay for it."""
+        try:
+            await self.http_client.head(str(self.openai.base_url))
+        except httpx.HTTPError as e:
+            print(f"LLM connection warm-up failed: {e}")
+
+    def stats(self) -> dict:
+        pool = self.chat.completions.stats
+        return {**pool, "circuit": self.breaker.state, "circuit_opened": self.breaker.times_opened}
+
+    async def aclose(self) -> None:
+        await self.http_client.aclose()
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """The shared, bounded HTTP connection pool used for every LLM request."""
+    http2 = LLM_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("LLM_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=LLM_CONNECT_TIMEOUT,
+            read=LLM_READ_TIMEOUT,
+            write=LLM_WRITE_TIMEOUT,
+            pool=LLM_POOL_TIMEOUT,
+        ),
+    )
@@ -0,0 +1,119 @@
+"""
+Write Throughput Load Test
+Hammers a scratch SQLite database with concurrent chat-style writes (insert a
+message, touch its conversation) under each database profile
+
+Usage:
+    python loadtest_writes.py [--writers 50] [--writes 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    "default": {"SQLITE_TUNING": "false", "WRITE_QUEUE": "false"},
+    "pragmas": {"SQLITE_TUNING": "true", "WRITE_QUEUE": "false"},
+    "pragmas+queue": {"SQLITE_TUNING": "true", "WRITE_QUEUE": "true"},
+}
+
+
+async def run_worker(writers: int, writes: int) -> dict:
+    # Imported here so the profile chosen by the parent process applies
+    from datetime import datetime
+    from sqlalchemy import update
+
+    from database import create_db_and_tables, engine
+    from models import Conversation, Message, User
+    from write_queue import run_write, write_queue
+
+    await create_db_and_tables()
+
+    async def setup(session):
+        user = User(username="loadtest", email="loadtest@example.com", hashed_password="-")
+        session.add(user)
+        await session.flush()
+        conversations = [Conversation(user_id=user.id) for _ in range(writers)]
+        session.add_all(conversations)
+        await session.flush()
+        return [conversation.id for conversation in conversations]
+
+    conversation_ids = await run_write(setup)
+    errors: dict = {}
+
+    async def writer(conversation_id: int):
+        for i in range(writes):
+            async def write(session):
+                session.add(Message(conversation_id=conversation_id, role="user", content=f"message {i}"))
+                await session.exec(
+                    update(Conversation)
+                    .where(Conversation.id == conversation_id)
+                    .values(updated_at=datetime.utcnow())
+                )
+            try:
+                await run_write(write)
+            except Exception as e:
+                key = str(e).splitlines()[0][:80]
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(conversation_id) for conversation_id in conversation_ids))
+    elapsed = time.perf_counter() - started
+
+    await write_queue.close()
+    await engine.dispose()
+
+    failed = sum(errors.values())
+    return {
+        "writes": writers * writes - failed,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round((writers * writes - failed) / elapsed, 1),
+        "errors": errors,
+        "batches": write_queue.batches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure concurrent SQLite write throughput")
+    parser.add_argument("--writers", type=int, default=50, help="concurrent writers")
+    parser.add_argument("--writes", type=int, default=20, help="writes per writer")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_worker(args.writers, args.writes))))
+        return
+
+    print(f"{args.writers} writers x {args.writes} writes")
+    for name, profile in PROFILES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, **profile)
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'loadtest.db')}"
+            env.setdefault("SECRET_KEY", "loadtest")
+            completed = subprocess.run(
+                [sys.executable, __file__, "--worker", f"--writers={args.writers}", f"--writes={args.writes}"],
+                env=env,
+                capture_output=True,
+                text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+        if completed.returncode != 0:
+            print(f"{name:>14}: worker failed\n{completed.stderr}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{name:>14}: {result['writes_per_second']:>8} writes/s  "
+            f"{result['failed']} failed  {result['seconds']}s  {result['batches']} group commits"
+        )
+        for error, count in result["errors"].items():
+            print(f"{'':>16}{count} x {error}")
+
+
+if __name__ == "__main__":
+    main()
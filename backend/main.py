@@ -1,14 +1,43 @@
+import asyncio
 import os
+import secrets
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import create_db_and_tables
+import metrics
+from admission import governor
+from agent import client as llm_client, llm_client_stats
+from auth import password_hash_stats
+from database import create_db_and_tables, engine, pool_stats
+from response_cache import response_cache_stats
+from retention import CONVERSATION_RETENTION_DAYS, retention_loop
+from write_queue import write_queue
 from routers import todos, users, auth, chat
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    await create_db_and_tables()
+    if hasattr(llm_client, "warm_up"):
+        # Connect to the LLM provider while the first requests come in
+        asyncio.create_task(llm_client.warm_up())
+    retention_task = None
+    if CONVERSATION_RETENTION_DAYS > 0:
+        retention_task = asyncio.create_task(retention_loop())
     yield
+    if retention_task:
+        retention_task.cancel()
+    await write_queue.close()
+    if hasattr(llm_client, "aclose"):
+        await llm_client.aclose()
+    # aiosqlite keeps pooled connections on worker threads; release them so
+    # the process can exit cleanly.
+    await engine.dispose()
+
+# /metrics exposes internals (pool, queue, cache and LLM stats): it is only
+# served to requests bearing this token, and is off while it is unset
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
 
 app = FastAPI(
     title="Todo AI Chatbot API",
@@ -25,8 +54,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-route request latency for the Prometheus metrics
+if metrics.METRICS:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(todos.router)
 app.include_router(users.router)
 app.include_router(auth.router)
@@ -35,3 +69,30 @@ app.include_router(chat.router)
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
+
+@app.get("/metrics")
+def read_metrics(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(json|prometheus)$"),
+):
+    """
+    Component stats as JSON, or every metric in the Prometheus text format
+    for scrapers (Accept: text/plain or openmetrics, or ?format=prometheus).
+    Requires "Authorization: Bearer $METRICS_TOKEN".
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    authorized = scheme.lower() == "bearer" and secrets.compare_digest(token.encode(), METRICS_TOKEN.encode())
+    if not METRICS_TOKEN or not authorized:
+        raise HTTPException(status_code=404, detail="Not Found")
+    stats = {
+        "password_hashing": password_hash_stats(),
+        "database_pool": pool_stats(),
+        "write_queue": write_queue.stats(),
+        "response_cache": response_cache_stats(),
+        "llm_client": llm_client_stats(),
+        "llm_admission": governor.stats(),
+    }
+    accept = request.headers.get("accept", "")
+    if format == "prometheus" or (format is None and ("text/plain" in accept or "openmetrics" in accept)):
+        return PlainTextResponse(metrics.render(stats), media_type="text/plain; version=0.0.4; charset=utf-8")
+    return stats
@@ -5,26 +5,43 @@ Exposes task management tools for AI agents via Model Context Protocol
 
 import asyncio
 import json
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
-from sqlmodel import Session, select
-from database import engine
+from sqlmodel import select
+from database import async_session, tool_session
 from models import Todo, User
+from bulk import (
+    BULK_MAX_ITEMS,
+    check_batch_size,
+    create_todos,
+    delete_todos,
+    fetch_todos,
+    owned_completion,
+    set_todos_completed,
+)
+from stats import apply_task_delta, get_task_counts, get_task_previews
+from tool_registry import registry
+from write_queue import run_write
 
 
 # Create MCP server
 mcp = Server("todo-mcp-server")
 
+# Page size of list_tasks, capped so large lists never flood the agent prompt
+LIST_TASKS_PAGE_SIZE = int(os.getenv("LIST_TASKS_PAGE_SIZE", "50"))
+LIST_TASKS_MAX_PAGE_SIZE = int(os.getenv("LIST_TASKS_MAX_PAGE_SIZE", "100"))
 
-def get_user_by_id(user_id: str) -> Optional[User]:
+
+async def get_user_by_id(user_id: str) -> Optional[User]:
     """Get user by ID from database."""
-    with Session(engine) as session:
+    async with async_session() as session:
         try:
             uid = int(user_id)
-            return session.get(User, uid)
+            return await session.get(User, uid)
         except ValueError:
             return None
 
@@ -32,244 +49,130 @@ def get_user_by_id(user_id: str) -> Optional[User]:
 @mcp.list_tools()
 async def list_tools() -> list[Tool]:
     """List all available MCP tools."""
-    return [
-        Tool(
-            name="add_task",
-            description="Create a new task for the user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    },
-                    "title": {
-                        "type": "string",
-                        "description": "The task title/content"
-                    },
-                    "description": {
-                        "type": "string",
-                        "description": "Optional task description"
-                    }
-                },
-                "required": ["user_id", "title"]
-            }
-        ),
-        Tool(
-            name="list_tasks",
-            description="Retrieve tasks from the user's list",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    },
-                    "status": {
-                        "type": "string",
-                        "enum": ["all", "pending", "completed"],
-                        "description": "Filter by status: all, pending, or completed"
-                    }
-                },
-                "required": ["user_id"]
-            }
-        ),
-        Tool(
-            name="complete_task",
-            description="Mark a task as complete",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    },
-                    "task_id": {
-                        "type": "integer",
-                        "description": "The task ID to complete"
-                    }
-                },
-                "required": ["user_id", "task_id"]
-            }
-        ),
-        Tool(
-            name="delete_task",
-            description="Delete a task",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    },
-                    "task_id": {
-                        "type": "integer",
-                        "description": "The task ID to delete"
-                    }
-                },
-                "required": ["user_id", "task_id"]
-            }
-        ),
-        Tool(
-            name="update_task",
-            description="Update a task's title or mark it incomplete",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    },
-                    "task_id": {
-                        "type": "integer",
-                        "description": "The task ID to update"
-                    },
-                    "title": {
-                        "type": "string",
-                        "description": "New task title"
-                    },
-                    "completed": {
-                        "type": "boolean",
-                        "description": "Task completion status"
-                    }
-                },
-                "required": ["user_id", "task_id"]
-            }
-        ),
-        Tool(
-            name="get_task_summary",
-            description="Get a comprehensive summary and statistics of the user's tasks including completion rates, productivity insights, and task breakdown",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    }
-                },
-                "required": ["user_id"]
-            }
-        ),
-        Tool(
-            name="get_productivity_insights",
-            description="Get AI-friendly productivity insights and suggestions based on task patterns",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    }
-                },
-                "required": ["user_id"]
-            }
-        )
-    ]
+    return registry.mcp_tools()
 
 
 @mcp.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls from the AI agent."""
-
-    if name == "add_task":
-        result = await add_task(
-            user_id=arguments["user_id"],
-            title=arguments["title"],
-            description=arguments.get("description", "")
-        )
-    elif name == "list_tasks":
-        result = await list_tasks(
-            user_id=arguments["user_id"],
-            status=arguments.get("status", "all")
-        )
-    elif name == "complete_task":
-        result = await complete_task(
-            user_id=arguments["user_id"],
-            task_id=arguments["task_id"]
-        )
-    elif name == "delete_task":
-        result = await delete_task(
-            user_id=arguments["user_id"],
-            task_id=arguments["task_id"]
-        )
-    elif name == "update_task":
-        result = await update_task(
-            user_id=arguments["user_id"],
-            task_id=arguments["task_id"],
-            title=arguments.get("title"),
-            completed=arguments.get("completed")
-        )
-    elif name == "get_task_summary":
-        result = await get_task_summary(
-            user_id=arguments["user_id"]
-        )
-    elif name == "get_productivity_insights":
-        result = await get_productivity_insights(
-            user_id=arguments["user_id"]
-        )
+    arguments = dict(arguments or {})
+    user_id = arguments.pop("user_id", None)
+    if user_id is None:
+        result = {"error": "Missing required argument(s): user_id"}
     else:
-        result = {"error": f"Unknown tool: {name}"}
+        result = await registry.call(name, arguments, user_id)
 
     return [TextContent(type="text", text=json.dumps(result))]
 
 
+@registry.tool(
+    description="Create a new task for the user",
+    parameters={
+        "title": {"type": "string", "description": "The task title/content"},
+        "description": {"type": "string", "description": "Optional task description"}
+    },
+    required=["title"]
+)
 async def add_task(user_id: str, title: str, description: str = "") -> dict:
     """Create a new task for the user."""
-    with Session(engine) as session:
-        try:
-            uid = int(user_id)
-            # Combine title and description
-            content = title
-            if description:
-                content = f"{title} - {description}"
-
+    try:
+        uid = int(user_id)
+        # Combine title and description
+        content = title
+        if description:
+            content = f"{title} - {description}"
+
+        async def write(session):
             todo = Todo(content=content, user_id=uid, completed=False)
             session.add(todo)
-            session.commit()
-            session.refresh(todo)
+            # Flushes the insert, which assigns todo.id
+            await apply_task_delta(session, uid, total=1)
 
             return {
                 "task_id": todo.id,
                 "status": "created",
                 "title": todo.content
             }
-        except Exception as e:
-            return {"error": str(e)}
 
-
-async def list_tasks(user_id: str, status: str = "all") -> list:
-    """List tasks for the user with optional status filter."""
-    with Session(engine) as session:
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@registry.tool(
+    description="Retrieve tasks from the user's list, one page at a time",
+    parameters={
+        "status": {
+            "type": "string",
+            "enum": ["all", "pending", "completed"],
+            "description": "Filter by status: all, pending, or completed. Default is all."
+        },
+        "after": {
+            "type": "integer",
+            "description": "Continuation token: pass next_after from the previous page to get the next one"
+        },
+        "limit": {
+            "type": "integer",
+            "description": f"Maximum number of tasks to return (default {LIST_TASKS_PAGE_SIZE}, max {LIST_TASKS_MAX_PAGE_SIZE})"
+        }
+    },
+    read_only=True
+)
+async def list_tasks(
+    user_id: str,
+    status: str = "all",
+    after: Optional[int] = None,
+    limit: int = LIST_TASKS_PAGE_SIZE
+) -> dict:
+    """List one page of tasks for the user with optional status filter."""
+    async with tool_session() as session:
         try:
             uid = int(user_id)
+            limit = max(1, min(limit, LIST_TASKS_MAX_PAGE_SIZE))
             query = select(Todo).where(Todo.user_id == uid)
 
             if status == "pending":
                 query = query.where(Todo.completed == False)
             elif status == "completed":
                 query = query.where(Todo.completed == True)
+            if after is not None:
+                query = query.where(Todo.id > after)
 
-            todos = session.exec(query).all()
+            # Fetch one extra row to learn whether another page exists
+            todos = (await session.exec(query.order_by(Todo.id).limit(limit + 1))).all()
+            has_more = len(todos) > limit
+            todos = todos[:limit]
 
-            return [
-                {
-                    "id": todo.id,
-                    "title": todo.content,
-                    "completed": todo.completed
-                }
-                for todo in todos
-            ]
+            return {
+                "tasks": [
+                    {
+                        "id": todo.id,
+                        "title": todo.content,
+                        "completed": todo.completed
+                    }
+                    for todo in todos
+                ],
+                "next_after": todos[-1].id if has_more else None
+            }
         except Exception as e:
             print(f"Error listing tasks: {str(e)}")
-            return []
+            return {"tasks": [], "next_after": None}
 
 
+@registry.tool(
+    description="Mark a task as complete",
+    parameters={
+        "task_id": {"type": "integer", "description": "The task ID to complete"}
+    },
+    required=["task_id"]
+)
 async def complete_task(user_id: str, task_id: int) -> dict:
     """Mark a task as completed."""
-    with Session(engine) as session:
-        try:
-            uid = int(user_id)
-            todo = session.get(Todo, task_id)
+    try:
+        uid = int(user_id)
+
+        async def write(session):
+            todo = await session.get(Todo, task_id)
 
             if not todo:
                 return {"error": "Task not found"}
@@ -277,26 +180,33 @@ async def complete_task(user_id: str, task_id: int) -> dict:
             if todo.user_id != uid:
                 return {"error": "Access denied"}
 
-            todo.completed = True
-            session.add(todo)
-            session.commit()
-            session.refresh(todo)
+            await set_todos_completed(session, uid, [todo.id])
 
             return {
                 "task_id": todo.id,
                 "status": "completed",
                 "title": todo.content
             }
-        except Exception as e:
-            return {"error": str(e)}
+
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
 
 
+@registry.tool(
+    description="Delete a task",
+    parameters={
+        "task_id": {"type": "integer", "description": "The task ID to delete"}
+    },
+    required=["task_id"]
+)
 async def delete_task(user_id: str, task_id: int) -> dict:
     """Delete a task."""
-    with Session(engine) as session:
-        try:
-            uid = int(user_id)
-            todo = session.get(Todo, task_id)
+    try:
+        uid = int(user_id)
+
+        async def write(session):
+            todo = await session.get(Todo, task_id)
 
             if not todo:
                 return {"error": "Task not found"}
@@ -305,18 +215,131 @@ async def delete_task(user_id: str, task_id: int) -> dict:
                 return {"error": "Access denied"}
 
             title = todo.content
-            session.delete(todo)
-            session.commit()
+            if not await delete_todos(session, uid, [todo.id]):
+                return {"error": "Task not found"}
 
             return {
                 "task_id": task_id,
                 "status": "deleted",
                 "title": title
             }
-        except Exception as e:
-            return {"error": str(e)}
 
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@registry.tool(
+    description=f"Create several tasks at once (up to {BULK_MAX_ITEMS})",
+    parameters={
+        "titles": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "The task titles to create"
+        }
+    },
+    required=["titles"]
+)
+async def add_tasks(user_id: str, titles: list) -> dict:
+    """Create several tasks in one transaction."""
+    error = check_batch_size(titles)
+    if error:
+        return {"error": error}
+    try:
+        uid = int(user_id)
+
+        async def write(session):
+            todos = await create_todos(session, uid, titles)
 
+            return {
+                "status": "created",
+                "tasks": [{"task_id": todo.id, "title": todo.content} for todo in todos]
+            }
+
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@registry.tool(
+    description=f"Mark several tasks as complete at once (up to {BULK_MAX_ITEMS})",
+    parameters={
+        "task_ids": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "description": "The task IDs to complete"
+        }
+    },
+    required=["task_ids"]
+)
+async def complete_tasks(user_id: str, task_ids: list) -> dict:
+    """Mark several tasks as completed in one transaction."""
+    error = check_batch_size(task_ids)
+    if error:
+        return {"error": error}
+    try:
+        uid = int(user_id)
+
+        async def write(session):
+            owned = await owned_completion(session, uid, task_ids)
+            await set_todos_completed(session, uid, list(owned))
+            todos = await fetch_todos(session, list(owned))
+
+            return {
+                "status": "completed",
+                "tasks": [{"task_id": todo.id, "title": todo.content} for todo in todos],
+                "not_found": sorted(set(task_ids) - owned.keys())
+            }
+
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@registry.tool(
+    description=f"Delete several tasks at once (up to {BULK_MAX_ITEMS})",
+    parameters={
+        "task_ids": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "description": "The task IDs to delete"
+        }
+    },
+    required=["task_ids"]
+)
+async def delete_tasks(user_id: str, task_ids: list) -> dict:
+    """Delete several tasks in one transaction."""
+    error = check_batch_size(task_ids)
+    if error:
+        return {"error": error}
+    try:
+        uid = int(user_id)
+
+        async def write(session):
+            owned = await owned_completion(session, uid, task_ids)
+            todos = await fetch_todos(session, list(owned))
+            await delete_todos(session, uid, list(owned))
+
+            return {
+                "status": "deleted",
+                "tasks": [{"task_id": todo.id, "title": todo.content} for todo in todos],
+                "not_found": sorted(set(task_ids) - owned.keys())
+            }
+
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@registry.tool(
+    description="Update a task's title or completion status",
+    parameters={
+        "task_id": {"type": "integer", "description": "The task ID to update"},
+        "title": {"type": "string", "description": "New task title"},
+        "completed": {"type": "boolean", "description": "Task completion status"}
+    },
+    required=["task_id"]
+)
 async def update_task(
     user_id: str,
     task_id: int,
@@ -324,10 +347,11 @@ async def update_task(
     completed: Optional[bool] = None
 ) -> dict:
     """Update a task's details."""
-    with Session(engine) as session:
-        try:
-            uid = int(user_id)
-            todo = session.get(Todo, task_id)
+    try:
+        uid = int(user_id)
+
+        async def write(session):
+            todo = await session.get(Todo, task_id)
 
             if not todo:
                 return {"error": "Task not found"}
@@ -337,12 +361,11 @@ async def update_task(
 
             if title is not None:
                 todo.content = title
+                session.add(todo)
             if completed is not None:
-                todo.completed = completed
-
-            session.add(todo)
-            session.commit()
-            session.refresh(todo)
+                await set_todos_completed(session, uid, [todo.id], completed)
+            else:
+                await apply_task_delta(session, uid)
 
             return {
                 "task_id": todo.id,
@@ -350,34 +373,33 @@ async def update_task(
                 "title": todo.content,
                 "completed": todo.completed
             }
-        except Exception as e:
-            return {"error": str(e)}
+
+        return await run_write(write)
+    except Exception as e:
+        return {"error": str(e)}
 
 
+@registry.tool(
+    description="Get a comprehensive summary and statistics of the user's tasks including completion rates and task breakdown",
+    read_only=True
+)
 async def get_task_summary(user_id: str) -> dict:
     """Get comprehensive task summary and statistics."""
-    with Session(engine) as session:
+    async with tool_session() as session:
         try:
             uid = int(user_id)
-            query = select(Todo).where(Todo.user_id == uid)
-            todos = session.exec(query).all()
-
-            total_tasks = len(todos)
-            completed_tasks = sum(1 for t in todos if t.completed)
-            pending_tasks = total_tasks - completed_tasks
-            completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+            counts = await get_task_counts(session, uid)
 
             # Get task titles for context
-            pending_task_titles = [t.content for t in todos if not t.completed][:5]
-            completed_task_titles = [t.content for t in todos if t.completed][:5]
+            pending_task_titles = [
+                t.content for t in await get_task_previews(session, uid, completed=False)
+            ]
+            completed_task_titles = [
+                t.content for t in await get_task_previews(session, uid, completed=True)
+            ]
 
             return {
-                "summary": {
-                    "total_tasks": total_tasks,
-                    "completed_tasks": completed_tasks,
-                    "pending_tasks": pending_tasks,
-                    "completion_rate": round(completion_rate, 1)
-                },
+                "summary": counts,
                 "pending_tasks_preview": pending_task_titles,
                 "completed_tasks_preview": completed_task_titles,
                 "status": "success"
@@ -386,17 +408,19 @@ async def get_task_summary(user_id: str) -> dict:
             return {"error": str(e)}
 
 
+@registry.tool(
+    description="Get productivity insights and smart suggestions based on task patterns",
+    read_only=True
+)
 async def get_productivity_insights(user_id: str) -> dict:
     """Get productivity insights and suggestions based on task patterns."""
-    with Session(engine) as session:
+    async with tool_session() as session:
         try:
             uid = int(user_id)
-            query = select(Todo).where(Todo.user_id == uid)
-            todos = session.exec(query).all()
-
-            total_tasks = len(todos)
-            completed_tasks = sum(1 for t in todos if t.completed)
-            pending_tasks = total_tasks - completed_tasks
+            counts = await get_task_counts(session, uid)
+            total_tasks = counts["total_tasks"]
+            completed_tasks = counts["completed_tasks"]
+            pending_tasks = counts["pending_tasks"]
             completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
 
             # Generate insights based on patterns
@@ -436,17 +460,15 @@ async def get_productivity_insights(user_id: str) -> dict:
                     suggestions.append("Time to plan your next set of goals and tasks.")
 
             # Get pending tasks for actionable suggestions
-            pending_task_list = [{"id": t.id, "title": t.content} for t in todos if not t.completed][:5]
+            pending_task_list = [
+                {"id": t.id, "title": t.content}
+                for t in await get_task_previews(session, uid, completed=False)
+            ]
 
             return {
                 "insights": insights,
                 "suggestions": suggestions,
-                "metrics": {
-                    "total_tasks": total_tasks,
-                    "completed_tasks": completed_tasks,
-                    "pending_tasks": pending_tasks,
-                    "completion_rate": round(completion_rate, 1)
-                },
+                "metrics": counts,
                 "actionable_tasks": pending_task_list,
                 "status": "success"
             }
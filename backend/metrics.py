@@ -0,0 +1,259 @@
+"""
+Prometheus Metrics
+Minimal in-process registry of counters and histograms rendered in the
+Prometheus text format, plus the HTTP middleware and LLM client wrapper that
+feed it (METRICS=false turns all instrumentation off)
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+METRICS = os.getenv("METRICS", "true").lower() in ("1", "true", "yes")
+
+# Request and query latencies, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM calls and SSE streams run for seconds to minutes
+LONG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        if not METRICS:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = list(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value:g}" for key, value in values]
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if not METRICS:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "todo_http_request_duration_seconds",
+    "HTTP request latency until the response body is complete",
+    ("method", "route", "status"),
+)
+DB_QUERY_SECONDS = Histogram(
+    "todo_db_query_duration_seconds", "Database statement execution time", ("operation",)
+)
+DB_QUERY_ERRORS = Counter("todo_db_query_errors_total", "Database statements that raised", ("operation",))
+TOOL_SECONDS = Histogram("todo_tool_duration_seconds", "MCP tool execution time", ("tool",))
+TOOL_ERRORS = Counter("todo_tool_errors_total", "MCP tool calls that returned an error", ("tool",))
+LLM_TTFT_SECONDS = Histogram(
+    "todo_llm_time_to_first_token_seconds",
+    "Time from sending a streamed completion request to its first token",
+    ("model",), LONG_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "todo_llm_request_duration_seconds", "Total LLM completion latency", ("model", "stream"), LONG_BUCKETS
+)
+LLM_ERRORS = Counter("todo_llm_errors_total", "LLM completion requests that failed", ("model",))
+LLM_TOKENS = Counter("todo_llm_tokens_total", "LLM tokens reported by the provider", ("model", "kind"))
+CHAT_STREAM_SECONDS = Histogram(
+    "todo_chat_stream_duration_seconds", "Lifetime of /chat/stream SSE responses", ("outcome",), LONG_BUCKETS
+)
+
+
+def _flatten(prefix: str, value, out: List[str]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}_{key}", item, out)
+    elif isinstance(value, bool):
+        out.append(f"{prefix} {int(value)}")
+    elif isinstance(value, (int, float)):
+        out.append(f"{prefix} {value:g}")
+    elif isinstance(value, str):
+        out.append(f'{prefix}{{value="{_escape(value)}"}} 1')
+
+
+def render(snapshots: Optional[Dict[str, dict]] = None) -> str:
+    """
+    All registered metrics in the Prometheus text exposition format.
+
+    snapshots are the component stats served as JSON by /metrics; their
+    numeric values are exported as untyped todo_<component>_<key> samples.
+    """
+    lines: List[str] = []
+    for metric in _registry:
+        lines += metric.render()
+    for component, stats in (snapshots or {}).items():
+        _flatten(f"todo_{component}", stats, lines)
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request per route template; streaming responses included."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; unmatched
+            # paths share one series to bound label cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route, str(status))
+
+
+def observe_tool(tool: str, elapsed: float, result) -> None:
+    """Tool timing hook for registry.add_timing_hook."""
+    TOOL_SECONDS.observe(elapsed, tool)
+    if isinstance(result, dict) and "error" in result:
+        TOOL_ERRORS.inc(tool)
+
+
+def _record_usage(model: str, usage) -> None:
+    if usage is None:
+        return
+    LLM_TOKENS.inc(model, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.inc(model, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
+
+
+class _InstrumentedCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    async def create(self, **kwargs):
+        model = kwargs.get("model") or "unknown"
+        started = time.perf_counter()
+        try:
+            result = await self._completions.create(**kwargs)
+        except Exception:
+            LLM_ERRORS.inc(model)
+            raise
+        if not kwargs.get("stream"):
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, model, "false")
+            _record_usage(model, getattr(result, "usage", None))
+            return result
+        return self._stream(result, model, started)
+
+    async def _stream(self, stream, model: str, started: float):
+        first_token = True
+        usage = None
+        try:
+            async for chunk in stream:
+                if first_token and chunk.choices and (
+                    chunk.choices[0].delta.content or chunk.choices[0].delta.tool_calls
+                ):
+                    LLM_TTFT_SECONDS.observe(time.perf_counter() - started, model)
+                    first_token = False
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                yield chunk
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, model, "true")
+            _record_usage(model, usage)
+
+
+class _InstrumentedChat:
+    def __init__(self, chat):
+        self.completions = _InstrumentedCompletions(chat.completions)
+
+
+class InstrumentedLLM:
+    """Wraps an OpenAI-style client to record latency, time to first token and token usage."""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = _InstrumentedChat(client.chat)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_llm(client):
+    """The client wrapped for metrics, or unchanged when metrics are off."""
+    return InstrumentedLLM(client) if METRICS else client
@@ -1,9 +1,15 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class Todo(SQLModel, table=True):
+    __table_args__ = (
+        # Serves per-user listing, status filters and keyset pagination
+        Index("ix_todo_user_completed_id", "user_id", "completed", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     content: str
     completed: bool = Field(default=False)
@@ -20,6 +26,11 @@ class User(SQLModel, table=True):
 
 
 class Conversation(SQLModel, table=True):
+    __table_args__ = (
+        # Serves the per-user conversation list, newest first, with keyset pagination
+        Index("ix_conversation_user_updated_id", "user_id", "updated_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
     title: str = Field(default="New Chat")
@@ -28,9 +39,31 @@ class Conversation(SQLModel, table=True):
 
 
 class Message(SQLModel, table=True):
+    __table_args__ = (
+        # Serves transcript pages, read backwards from the newest message
+        Index("ix_message_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    conversation_id: int = Field(foreign_key="conversation.id", index=True)
+    conversation_id: int = Field(foreign_key="conversation.id", index=True, ondelete="CASCADE")
     role: str = Field(...)  # "user" | "assistant" | "system"
     content: str = Field(...)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     tool_calls: Optional[str] = Field(default=None)  # JSON string of tool calls
+
+
+class ConversationSummary(SQLModel, table=True):
+    conversation_id: int = Field(foreign_key="conversation.id", primary_key=True, ondelete="CASCADE")
+    content: str = Field(default="")
+    last_message_id: int = Field(default=0)  # newest message folded into the summary
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class UserTaskStats(SQLModel, table=True):
+    __tablename__ = "user_task_stats"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    total: int = Field(default=0)
+    completed: int = Field(default=0)
+    pending: int = Field(default=0)
+    last_activity: datetime = Field(default_factory=datetime.utcnow)
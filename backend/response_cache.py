@@ -0,0 +1,170 @@
+"""
+Agent Response Cache
+Serves repeated read-only questions ("show my tasks", "how am I doing") without
+an LLM round trip, for as long as the user's tasks are unchanged
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+# Opt-in: serve cached agent responses
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+# Minimum cosine similarity of hashed character trigrams for a fuzzy hit;
+# 0 restricts hits to prompts that normalize identically
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+# Dimensions of the hashed trigram vectors used for similarity
+_VECTOR_SIZE = 256
+# Words that do not change what is being asked
+_FILLER_WORDS = {
+    "please", "pls", "plz", "can", "could", "would", "you", "hey", "hi", "hello",
+    "thanks", "thank", "me", "just", "kindly", "the",
+}
+
+
+@dataclass
+class _Entry:
+    response: str
+    version: int
+    vector: Dict[int, float]
+    stored_at: float
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Tuple[int, str], _Entry]" = OrderedDict()
+_keys_by_user: Dict[int, Set[str]] = {}
+# Task-state version per user, bumped by every todo write (see stats.py)
+_state_versions: Dict[int, int] = {}
+_counters = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "stale": 0, "stores": 0}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace."""
+    words = re.sub(r"[^\w\s]", " ", prompt.lower()).split()
+    return " ".join(word for word in words if word not in _FILLER_WORDS)
+
+
+def _trigram_vector(text: str) -> Dict[int, float]:
+    padded = f"  {text} "
+    counts: Dict[int, float] = {}
+    for i in range(len(padded) - 2):
+        digest = hashlib.blake2s(padded[i:i + 3].encode(), digest_size=4).digest()
+        bucket = int.from_bytes(digest, "little") % _VECTOR_SIZE
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return {bucket: value / norm for bucket, value in counts.items()}
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+
+def state_version(user_id: int) -> int:
+    """Current task-state version of a user; capture it before running the agent."""
+    return _state_versions.get(user_id, 0)
+
+
+def bump_task_state(user_id: int) -> None:
+    """Invalidate every cached response of a user (called on todo writes)."""
+    with _lock:
+        _state_versions[user_id] = _state_versions.get(user_id, 0) + 1
+
+
+def _drop(key: Tuple[int, str]) -> None:
+    _entries.pop(key, None)
+    user_keys = _keys_by_user.get(key[0])
+    if user_keys is not None:
+        user_keys.discard(key[1])
+        if not user_keys:
+            del _keys_by_user[key[0]]
+
+
+def _usable(key: Tuple[int, str], entry: _Entry, now: float) -> bool:
+    if entry.version != _state_versions.get(key[0], 0) or now - entry.stored_at > RESPONSE_CACHE_TTL_SECONDS:
+        _drop(key)
+        _counters["stale"] += 1
+        return False
+    return True
+
+
+def lookup(user_id: int, prompt: str) -> Optional[str]:
+    """Return the cached response for an equivalent prompt, if still valid."""
+    if not RESPONSE_CACHE:
+        return None
+    normalized = normalize_prompt(prompt)
+    now = time.monotonic()
+    with _lock:
+        key = (user_id, normalized)
+        entry = _entries.get(key)
+        if entry is not None and _usable(key, entry, now):
+            _entries.move_to_end(key)
+            _counters["hits"] += 1
+            return entry.response
+
+        if RESPONSE_CACHE_SIMILARITY > 0:
+            vector = _trigram_vector(normalized)
+            best: Optional[Tuple[float, Tuple[int, str]]] = None
+            for other in list(_keys_by_user.get(user_id, ())):
+                other_key = (user_id, other)
+                other_entry = _entries[other_key]
+                if not _usable(other_key, other_entry, now):
+                    continue
+                score = _cosine(vector, other_entry.vector)
+                if score >= RESPONSE_CACHE_SIMILARITY and (best is None or score > best[0]):
+                    best = (score, other_key)
+            if best is not None:
+                _entries.move_to_end(best[1])
+                _counters["fuzzy_hits"] += 1
+                return _entries[best[1]].response
+
+        _counters["misses"] += 1
+        return None
+
+
+def store(user_id: int, prompt: str, response: str, version: int) -> None:
+    """
+    Cache a response computed against the given task-state version.
+
+    Only store responses of turns that used read-only tools: the answer must
+    depend on nothing but the user's tasks.
+    """
+    if not RESPONSE_CACHE:
+        return
+    normalized = normalize_prompt(prompt)
+    with _lock:
+        if version != _state_versions.get(user_id, 0):
+            # The tasks changed while the agent was running
+            return
+        key = (user_id, normalized)
+        _entries[key] = _Entry(
+            response=response,
+            version=version,
+            vector=_trigram_vector(normalized) if RESPONSE_CACHE_SIMILARITY > 0 else {},
+            stored_at=time.monotonic(),
+        )
+        _entries.move_to_end(key)
+        _keys_by_user.setdefault(user_id, set()).add(normalized)
+        _counters["stores"] += 1
+        while len(_entries) > RESPONSE_CACHE_SIZE:
+            _drop(next(iter(_entries)))
+
+
+def response_cache_stats() -> dict:
+    with _lock:
+        stats = dict(_counters)
+        stats["entries"] = len(_entries)
+    lookups = stats["hits"] + stats["fuzzy_hits"] + stats["misses"]
+    stats["enabled"] = RESPONSE_CACHE
+    stats["hit_rate"] = round((stats["hits"] + stats["fuzzy_hits"]) / lookups, 3) if lookups else 0.0
+    return stats
@@ -0,0 +1,89 @@
+"""
+Conversation Retention
+Set-based conversation deletion, shared by the chat endpoints and the background retention job
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_session, begin_write
+from models import Conversation, ConversationSummary, Message
+
+# Conversations not updated for this many days are purged (0 disables the job)
+CONVERSATION_RETENTION_DAYS = int(os.getenv("CONVERSATION_RETENTION_DAYS", "0"))
+# Seconds between two runs of the retention job
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+# Conversations deleted per statement; the job commits after each chunk so
+# SQLite's write lock is only held briefly
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+
+
+async def select_conversation_ids(
+    session: AsyncSession,
+    user_id: Optional[int] = None,
+    older_than: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> List[int]:
+    """IDs of the conversations matching the given owner and/or last-update cutoff."""
+    query = select(Conversation.id)
+    if user_id is not None:
+        query = query.where(Conversation.user_id == user_id)
+    if older_than is not None:
+        query = query.where(Conversation.updated_at < older_than)
+    query = query.order_by(Conversation.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return (await session.exec(query)).all()
+
+
+async def delete_conversations(session: AsyncSession, conversation_ids: List[int]) -> None:
+    """
+    Delete conversations with their messages and summaries, without committing.
+
+    Issues one DELETE per table per chunk instead of loading every message.
+    The foreign keys also cascade, but SQLite only enforces them when
+    PRAGMA foreign_keys is on, so dependent rows are deleted explicitly.
+    """
+    for start in range(0, len(conversation_ids), RETENTION_BATCH_SIZE):
+        chunk = conversation_ids[start:start + RETENTION_BATCH_SIZE]
+        await session.exec(delete(Message).where(Message.conversation_id.in_(chunk)))
+        await session.exec(
+            delete(ConversationSummary).where(ConversationSummary.conversation_id.in_(chunk))
+        )
+        await session.exec(delete(Conversation).where(Conversation.id.in_(chunk)))
+
+
+async def purge_expired_conversations(retention_days: int = CONVERSATION_RETENTION_DAYS) -> int:
+    """Delete conversations older than the retention period, one committed chunk at a time."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    async with async_session() as session:
+        while True:
+            # Each chunk is selected and deleted in one write transaction
+            await begin_write(session)
+            ids = await select_conversation_ids(
+                session, older_than=cutoff, limit=RETENTION_BATCH_SIZE
+            )
+            if not ids:
+                break
+            await delete_conversations(session, ids)
+            await session.commit()
+            deleted += len(ids)
+    return deleted
+
+
+async def retention_loop() -> None:
+    """Run purge_expired_conversations every RETENTION_INTERVAL_SECONDS."""
+    while True:
+        try:
+            deleted = await purge_expired_conversations()
+            if deleted:
+                print(f"Retention: deleted {deleted} expired conversation(s)")
+        except Exception as e:
+            print(f"Error purging expired conversations: {str(e)}")
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
@@ -2,7 +2,8 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import authenticate_user, create_access_token, get_password_hash
 from database import get_session
@@ -17,9 +18,9 @@ router = APIRouter(
 
 
 @router.post("/register", response_model=UserRead)
-async def register_user(user_create: UserCreate, session: Session = Depends(get_session)):
+async def register_user(user_create: UserCreate, session: AsyncSession = Depends(get_session)):
     # Check if username already exists
-    existing_user = session.exec(select(User).where(User.username == user_create.username)).first()
+    existing_user = (await session.exec(select(User).where(User.username == user_create.username))).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,14 +28,14 @@ async def register_user(user_create: UserCreate, session: Session = Depends(get_
         )
 
     # Check if email already exists
-    existing_email = session.exec(select(User).where(User.email == user_create.email)).first()
+    existing_email = (await session.exec(select(User).where(User.email == user_create.email))).first()
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
-    hashed_password = get_password_hash(user_create.password)
+    hashed_password = await get_password_hash(user_create.password)
     user = User(
         username=user_create.username,
         email=user_create.email,
@@ -42,16 +43,16 @@ async def register_user(user_create: UserCreate, session: Session = Depends(get_
         hashed_password=hashed_password,
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)
+    form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)
 ):
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,6 +61,6 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=30) # TODO: Move to config
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username}, expires_delta=access_token_expires, user=user
     )
     return {"access_token": access_token, "token_type": "bearer"}
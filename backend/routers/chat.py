@@ -5,361 +5,533 @@ Implements stateless chat endpoint with conversation persistence and streaming
 
 import asyncio
 import json
-from datetime import datetime
-from typing import List, AsyncGenerator
-from fastapi import APIRouter, Depends, HTTPException
+import math
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, AsyncGenerator, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
-from sqlmodel import Session, select
+from sqlalchemy import tuple_, update
+from sqlalchemy.orm import defer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models import Conversation, Message, User
-from database import get_session
+from database import async_session, begin_write, get_session, get_write_session
 from auth import get_current_active_user
 from schemas import (
     ChatRequest,
     ChatResponse,
     ConversationRead,
     ConversationDetail,
-    MessageRead
+    MessageRead,
+    TurnTraceRead
 )
+import metrics
+import response_cache
+from admission import LLM_QUEUE_EVENT_INTERVAL, RateLimitedError, governor
 from agent import run_agent, TOOLS, MODEL
+from history import load_history_window
+from retention import delete_conversations, select_conversation_ids
+from sse import SSEWriter, content_frame, event_frame
+from summarizer import get_summary, schedule_summary_refresh
+from turn_trace import TurnTrace
+from write_queue import run_write
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+CONVERSATIONS_PAGE_SIZE = int(os.environ.get("CONVERSATIONS_PAGE_SIZE", "50"))
+CONVERSATIONS_MAX_PAGE_SIZE = int(os.environ.get("CONVERSATIONS_MAX_PAGE_SIZE", "200"))
+MESSAGES_PAGE_SIZE = int(os.environ.get("MESSAGES_PAGE_SIZE", "50"))
+MESSAGES_MAX_PAGE_SIZE = int(os.environ.get("MESSAGES_MAX_PAGE_SIZE", "200"))
+
+
+async def create_conversation(user_id: int, title: str) -> Conversation:
+    """Create a conversation through the write queue."""
+    async def write(session):
+        conversation = Conversation(user_id=user_id, title=title)
+        session.add(conversation)
+        await session.flush()
+        return conversation
+
+    return await run_write(write)
+
+
+async def save_message(
+    conversation_id: int,
+    role: str,
+    content: str,
+    touch_conversation: bool = False,
+    tool_calls: Optional[str] = None
+) -> None:
+    """Persist a message through the write queue, optionally bumping the conversation's updated_at."""
+    async def write(session):
+        session.add(Message(conversation_id=conversation_id, role=role, content=content, tool_calls=tool_calls))
+        if touch_conversation:
+            await session.exec(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(updated_at=datetime.utcnow())
+            )
+
+    await run_write(write)
+
+
+@dataclass
+class TurnContext:
+    """Prompt context of a turn; streamed turns load it while the response is already streaming."""
+    history_messages: List[Message]
+    summary: Optional[str]
+    # Persists the turn's user message; await it before storing the reply
+    user_message_saved: asyncio.Task
+
+    @property
+    def conversation_history(self) -> List[dict]:
+        return [{"role": msg.role, "content": msg.content} for msg in self.history_messages]
+
+
+# User-message writes still in flight, referenced so they run to completion
+_pending_writes: set = set()
+
+
+async def load_turn_context(conversation_id: int, message: str) -> TurnContext:
+    """Read the history window and summary, then start persisting the user message."""
+    async with async_session() as session:
+        history_messages = await load_history_window(session, conversation_id)
+        summary = await get_summary(session, conversation_id)
+
+    # Written only once the history is read, so the window never contains it;
+    # the commit overlaps with the LLM request instead of delaying it
+    saved = asyncio.create_task(save_message(conversation_id, "user", message))
+    _pending_writes.add(saved)
+    saved.add_done_callback(_pending_writes.discard)
+    return TurnContext(history_messages, summary, saved)
+
+
+async def save_reply(
+    conversation_id: int,
+    content: str,
+    context: "asyncio.Task[TurnContext]",
+    tool_calls: Optional[str] = None
+) -> None:
+    """Persist the assistant reply after the turn's user message, keeping the two in order."""
+    turn = await context
+    await turn.user_message_saved
+    await save_message(conversation_id, "assistant", content, touch_conversation=True, tool_calls=tool_calls)
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many chat requests. Please try again shortly.",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+
+def admit_chat_request(user_id: int) -> None:
+    """
+    Apply the LLM queue bound, or fail with 429. The per-user rate is only
+    charged once a turn needs the LLM, not for cache hits or fast-path commands.
+    """
+    retry_after = governor.admit(user_id)
+    if retry_after is not None:
+        raise too_many_requests(retry_after)
+
 
 @router.post("/", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """
     Stateless chat endpoint.
 
+    The request session is only used for the conversation ownership check;
+    its connection is returned to the pool before the LLM runs.
+
     Flow:
     1. Receive user message
     2. Get or create conversation
-    3. Fetch conversation history from database
+    3. Fetch windowed conversation history from database
     4. Store user message in database
     5. Run agent with MCP tools
     6. Store assistant response in database
     7. Return response
     """
+    admit_chat_request(current_user.id)
+    user_id = current_user.id
+
     # Get or create conversation
     if request.conversation_id:
-        conversation = session.get(Conversation, request.conversation_id)
+        conversation = await session.get(Conversation, request.conversation_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         if conversation.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
+        conversation_id = conversation.id
     else:
         # Create new conversation
         # Use first few words of message as title
         title = request.message[:50] + "..." if len(request.message) > 50 else request.message
-        conversation = Conversation(
-            user_id=current_user.id,
-            title=title
-        )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
-
-    # Fetch conversation history from database
-    history_query = select(Message).where(
-        Message.conversation_id == conversation.id
-    ).order_by(Message.created_at)
-    history_messages = session.exec(history_query).all()
-
-    # Build history for agent
-    conversation_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in history_messages
-    ]
+        conversation_id = (await create_conversation(user_id, title)).id
 
-    # Store user message in database
-    user_message = Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=request.message
-    )
-    session.add(user_message)
-    session.commit()
+    # Hand the request session's connection back now; otherwise it stays
+    # checked out for the whole agent turn
+    await session.close()
+
+    # Fetch the windowed history and summary, then store the user message
+    context = asyncio.create_task(load_turn_context(conversation_id, request.message))
+    turn = await context
 
     # Run agent with MCP tools
+    trace = TurnTrace(MODEL)
     try:
-        response_content = await run_agent(
-            user_id=current_user.id,
+        response_content, response_metadata = await run_agent(
+            user_id=user_id,
             message=request.message,
-            conversation_history=conversation_history
+            conversation_history=turn.conversation_history,
+            summary=turn.summary,
+            trace=trace
         )
+    except RateLimitedError as e:
+        raise too_many_requests(e.retry_after)
     except Exception as e:
         # Store error message
-        error_message = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content="I'm sorry, I encountered an error. Please try again."
+        trace.error = str(e)
+        await turn.user_message_saved
+        await save_message(
+            conversation_id,
+            "assistant",
+            "I'm sorry, I encountered an error. Please try again.",
+            tool_calls=trace.to_json()
         )
-        session.add(error_message)
-        session.commit()
         raise HTTPException(status_code=500, detail=str(e))
 
-    # Store assistant response in database
-    assistant_message = Message(
-        conversation_id=conversation.id,
-        role="assistant",
-        content=response_content
-    )
-    session.add(assistant_message)
+    # Store assistant response with its trace and update the conversation timestamp
+    await save_reply(conversation_id, response_content, context, tool_calls=trace.to_json())
 
-    # Update conversation timestamp
-    conversation.updated_at = datetime.utcnow()
-    session.add(conversation)
-    session.commit()
+    # Fold turns that fell out of the window into the rolling summary
+    if turn.history_messages:
+        schedule_summary_refresh(conversation_id, turn.history_messages[0].id)
 
     return ChatResponse(
-        conversation_id=conversation.id,
+        conversation_id=conversation_id,
         message=response_content,
-        role="assistant"
+        role="assistant",
+        meta=response_metadata
     )
 
 
+class ToolCallAccumulator:
+    """
+    Reassemble streamed tool calls.
+
+    Providers split each tool call over many deltas: the first fragment of a
+    call carries its id and name, the following ones carry further pieces of
+    the JSON arguments. Fragments are matched to their call by index.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._calls)
+
+    def add(self, fragments) -> None:
+        for fragment in fragments:
+            call = self._calls.setdefault(
+                fragment.index, {"id": None, "name": "", "arguments": ""}
+            )
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function:
+                if fragment.function.name:
+                    call["name"] += fragment.function.name
+                if fragment.function.arguments:
+                    call["arguments"] += fragment.function.arguments
+
+    def to_messages(self) -> List[dict]:
+        """Completed calls in OpenAI assistant-message format, ordered by index."""
+        return [
+            {
+                "id": call["id"] or f"call_{index}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": call["arguments"]}
+            }
+            for index, call in sorted(self._calls.items())
+        ]
+
+
 async def stream_agent_response(
     user_id: int,
     message: str,
-    conversation_history: List[dict],
-    conversation_id: int
+    conversation_id: int,
+    context: "asyncio.Task[TurnContext]"
 ) -> AsyncGenerator[str, None]:
     """
     Stream the agent response token by token.
 
+    The history in context is only awaited when the LLM is needed, so cache
+    hits and fast-path commands do not wait for it.
+
+    Tokens that arrive close together are sent as one content frame (see
+    sse.SSEWriter); SSE_COALESCE_MS=0 sends every token as it arrives.
+
     Yields:
         JSON-formatted chunks containing streamed text segments
     """
     import agent
     from agent import client
 
-    # Build messages array
-    messages = [{"role": "system", "content": agent.SYSTEM_PROMPT}]
+    trace = TurnTrace(MODEL)
 
-    # Add conversation history
-    for msg in conversation_history:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        messages.append({"role": role, "content": content})
-
-    # Add new user message
-    messages.append({"role": "user", "content": message})
-
-    full_response = ""
-    tool_calls = []
+    # Answers to read-only questions only depend on the user's tasks
+    cached = response_cache.lookup(user_id, message)
+    if cached is not None:
+        trace.source = "cache"
+        yield content_frame(cached)
+        await save_reply(conversation_id, cached, context, tool_calls=trace.to_json())
+        yield event_frame({'type': 'done', 'conversation_id': conversation_id, 'meta': {'tool_rounds': [], 'cache': 'hit'}})
+        return
+    state_version = response_cache.state_version(user_id)
 
+    # Simple commands are executed without the LLM
     try:
-        # Make streaming API call
-        response = await client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto",
-            stream=True,
-        )
-
-        # Handle streaming response
-        async for chunk in response:
-            delta = chunk.choices[0].delta
-
-            # Handle content
-            if delta.content:
-                content = delta.content
-                full_response += content
-                yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
-
-            # Collect tool calls
-            if delta.tool_calls:
-                for tool_call in delta.tool_calls:
-                    tool_calls.append(tool_call)
-
-        # Handle tool calls if any
-        if tool_calls:
-            for tool_call in tool_calls:
-                tool_name = tool_call.function.name
-                arguments = json.loads(tool_call.function.arguments)
-
-                # Notify about tool call
-                yield f"data: {json.dumps({'type': 'tool_call', 'tool': tool_name})}\n\n"
-
-                # Execute the tool
-                from mcp_server import (
-                    add_task, list_tasks, complete_task, delete_task, update_task,
-                    get_task_summary, get_productivity_insights
-                )
-
-                user_id_str = str(user_id)
-
-                if tool_name == "add_task":
-                    result = await add_task(
-                        user_id=user_id_str,
-                        title=arguments.get("title", ""),
-                        description=arguments.get("description", "")
-                    )
-                elif tool_name == "list_tasks":
-                    result = await list_tasks(
-                        user_id=user_id_str,
-                        status=arguments.get("status", "all")
-                    )
-                elif tool_name == "complete_task":
-                    result = await complete_task(
-                        user_id=user_id_str,
-                        task_id=arguments.get("task_id")
-                    )
-                elif tool_name == "delete_task":
-                    result = await delete_task(
-                        user_id=user_id_str,
-                        task_id=arguments.get("task_id")
-                    )
-                elif tool_name == "update_task":
-                    result = await update_task(
-                        user_id=user_id_str,
-                        task_id=arguments.get("task_id"),
-                        title=arguments.get("title"),
-                        completed=arguments.get("completed")
-                    )
-                elif tool_name == "get_task_summary":
-                    result = await get_task_summary(user_id=user_id_str)
-                elif tool_name == "get_productivity_insights":
-                    result = await get_productivity_insights(user_id=user_id_str)
-                else:
-                    result = {"error": f"Unknown tool: {tool_name}"}
-
-                # Add tool result to messages
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(result)
-                })
-
-                # Stream tool result
-                yield f"data: {json.dumps({'type': 'tool_result', 'tool': tool_name, 'result': result})}\n\n"
-
-        # Continue with any additional response after tool calls
-        # Build messages with tool results
-        final_messages = messages.copy()
-
-        # Get next response (may have more content after tool results)
-        next_response = await client.chat.completions.create(
-            model=MODEL,
-            messages=final_messages,
-            tools=TOOLS,
-            tool_choice="auto",
-            stream=True,
-        )
+        fastpath = await agent.run_fastpath(user_id, message, trace)
+    except Exception as e:
+        yield event_frame({'type': 'error', 'error': str(e)})
+        return
+    if fastpath is not None:
+        content, meta = fastpath
+        yield content_frame(content)
+        await save_reply(conversation_id, content, context, tool_calls=trace.to_json())
+        yield event_frame({'type': 'done', 'conversation_id': conversation_id, 'meta': meta})
+        return
 
-        async for chunk in next_response:
-            delta = chunk.choices[0].delta
-            if delta.content:
-                content = delta.content
-                full_response += content
-                yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+    # Only turns that reach the LLM count against the user's rate
+    retry_after = governor.charge(user_id)
+    if retry_after is not None:
+        error = RateLimitedError(retry_after)
+        yield event_frame({'type': 'error', 'error': str(error), 'retry_after': math.ceil(retry_after)})
+        return
 
+    # The history was loading while the cache and the fast path were tried
+    try:
+        turn = await context
     except Exception as e:
-        yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+        yield event_frame({'type': 'error', 'error': str(e)})
         return
 
-    # Store assistant response in database using a new session
-    from database import engine
-    from sqlmodel import Session as SqlSession
-
-    with SqlSession(engine) as db_session:
-        assistant_message = Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=full_response
-        )
-        db_session.add(assistant_message)
+    # Build messages array
+    messages = agent.build_messages(message, turn.conversation_history, turn.summary)
+
+    # Tokens are coalesced into few frames; the reply text is joined once
+    writer = SSEWriter()
+    tool_rounds = []
+    rounds_exhausted = False
+
+    async with agent.agent_turn():
+        try:
+            while True:
+                round_start = writer.tokens
+                tool_calls = ToolCallAccumulator()
+                usage = finish_reason = first_token_at = None
+
+                # Wait for an LLM slot, telling the client its queue position
+                requested = time.perf_counter()
+                ticket = governor.enqueue(user_id)
+                try:
+                    while not ticket.granted:
+                        waited_ms = round((time.monotonic() - ticket.enqueued_at) * 1000)
+                        yield event_frame({'type': 'queued', 'position': governor.position(ticket), 'waited_ms': waited_ms})
+                        await governor.wait(ticket, LLM_QUEUE_EVENT_INTERVAL)
+
+                    # Make streaming API call
+                    response = await client.chat.completions.create(
+                        model=MODEL,
+                        messages=messages,
+                        tools=TOOLS,
+                        tool_choice=agent.tool_choice(tool_rounds),
+                        stream=True,
+                        # Token counts arrive in a final chunk without choices
+                        stream_options={"include_usage": True},
+                    )
 
-        # Update conversation timestamp
-        conversation = db_session.get(Conversation, conversation_id)
-        if conversation:
-            conversation.updated_at = datetime.utcnow()
-            db_session.add(conversation)
+                    # Handle streaming response
+                    async for chunk in writer.paced(response):
+                        if chunk is None:
+                            # Buffered tokens are due while the model is quiet
+                            yield writer.flush()
+                            continue
+                        if chunk.usage is not None:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        finish_reason = chunk.choices[0].finish_reason or finish_reason
+                        if first_token_at is None and (delta.content or delta.tool_calls):
+                            first_token_at = time.perf_counter()
+
+                        # Handle content
+                        if delta.content:
+                            frame = writer.add(delta.content)
+                            if frame:
+                                yield frame
+
+                        # Collect tool call fragments
+                        if delta.tool_calls:
+                            tool_calls.add(delta.tool_calls)
+
+                    frame = writer.flush()
+                    if frame:
+                        yield frame
+                finally:
+                    governor.release(ticket)
+                trace.add_llm_call(requested, ticket.wait_ms, usage, finish_reason, first_token_at)
+
+                round_content = writer.text(round_start)
+
+                # The model answered without tools (finish_reason=stop): no
+                # follow-up round trip is needed
+                if not tool_calls:
+                    break
+                if len(tool_rounds) >= agent.MAX_TOOL_ROUNDS:
+                    # The model kept calling tools after they were turned off
+                    rounds_exhausted = True
+                    frame = writer.add(agent.TOOL_ROUNDS_EXHAUSTED_REPLY) or writer.flush()
+                    if frame:
+                        yield frame
+                    break
+
+                assistant_tool_calls = tool_calls.to_messages()
+                messages.append({
+                    "role": "assistant",
+                    "content": round_content or None,
+                    "tool_calls": assistant_tool_calls
+                })
 
-        db_session.commit()
+                calls = [
+                    (call["function"]["name"], agent.decode_tool_arguments(call["function"]["arguments"]))
+                    for call in assistant_tool_calls
+                ]
+
+                # Notify about tool calls
+                for tool_name, _ in calls:
+                    yield event_frame({'type': 'tool_call', 'tool': tool_name})
+
+                # Execute the round, independent calls concurrently
+                results, round_timing = await agent.execute_tool_calls(calls, user_id)
+                tool_rounds.append(round_timing)
+                trace.add_tool_round(calls, results, round_timing)
+
+                for call, (tool_name, _), result in zip(assistant_tool_calls, calls, results):
+                    # Add tool result to messages
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": call["id"],
+                        "content": json.dumps(result)
+                    })
+
+                    # Stream tool result
+                    yield event_frame({'type': 'tool_result', 'tool': tool_name, 'result': result})
+
+        except Exception as e:
+            frame = writer.flush()
+            if frame:
+                yield frame
+            yield event_frame({'type': 'error', 'error': str(e)})
+            return
+
+    full_response = writer.text()
+    if not rounds_exhausted and agent.is_cacheable_turn(tool_rounds):
+        response_cache.store(user_id, message, full_response, state_version)
+
+    # Store assistant response and update the conversation timestamp; the
+    # request session is not used here because the response is still streaming
+    await save_reply(conversation_id, full_response, context, tool_calls=trace.to_json())
 
     # Send done signal
-    yield f"data: {json.dumps({'type': 'done', 'conversation_id': conversation_id})}\n\n"
+    yield event_frame({'type': 'done', 'conversation_id': conversation_id, 'meta': {'tool_rounds': tool_rounds}})
 
 
 @router.post("/stream")
 async def chat_stream(
     request: ChatRequest,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """
     Streaming chat endpoint - returns Server-Sent Events for real-time response.
 
+    Only authorization and the conversation ownership check run before the
+    response starts; everything else happens while it streams.
+
     Flow:
     1. Receive user message
-    2. Get or create conversation
-    3. Store user message in database
+    2. Create the conversation if needed and send the start event
+    3. Load the history window, then store the user message in the background
     4. Stream assistant response token by token
     5. Store full response when streaming completes
     """
-    # Get or create conversation
+    admit_chat_request(current_user.id)
+    user_id = current_user.id
+
+    conversation_id = None
     if request.conversation_id:
-        conversation = session.get(Conversation, request.conversation_id)
+        conversation = await session.get(Conversation, request.conversation_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         if conversation.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
-    else:
-        # Create new conversation
-        title = request.message[:50] + "..." if len(request.message) > 50 else request.message
-        conversation = Conversation(
-            user_id=current_user.id,
-            title=title
-        )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
-
-    # Get conversation ID before any streaming
-    conversation_id = conversation.id
-
-    # Fetch conversation history from database
-    history_query = select(Message).where(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at)
-    history_messages = session.exec(history_query).all()
-
-    # Build history for agent
-    conversation_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in history_messages
-    ]
+        conversation_id = conversation.id
 
-    # Store user message in database
-    user_message = Message(
-        conversation_id=conversation_id,
-        role="user",
-        content=request.message
-    )
-    session.add(user_message)
-    session.commit()
-
-    # Expunge all objects to detach from session
-    session.expunge_all()
+    # Hand the request session's connection back now; otherwise it stays
+    # checked out until the stream ends
+    await session.close()
 
     async def event_generator():
-        # Send conversation ID first
-        yield f"data: {json.dumps({'type': 'start', 'conversation_id': conversation_id})}\n\n"
-
-        # Stream the response
-        async for chunk in stream_agent_response(
-            user_id=current_user.id,
-            message=request.message,
-            conversation_history=conversation_history,
-            conversation_id=conversation_id
-        ):
-            yield chunk
+        started = time.perf_counter()
+        outcome = "completed"
+        context = None
+        try:
+            turn_conversation_id = conversation_id
+            if turn_conversation_id is None:
+                # Use first few words of message as title
+                title = request.message[:50] + "..." if len(request.message) > 50 else request.message
+                try:
+                    turn_conversation_id = (await create_conversation(user_id, title)).id
+                except Exception as e:
+                    outcome = "error"
+                    yield event_frame({'type': 'error', 'error': str(e)})
+                    return
+
+            # Send conversation ID first
+            yield event_frame({'type': 'start', 'conversation_id': turn_conversation_id})
+
+            # Stream the response while the history loads
+            context = asyncio.create_task(load_turn_context(turn_conversation_id, request.message))
+            async for chunk in stream_agent_response(
+                user_id=user_id,
+                message=request.message,
+                conversation_id=turn_conversation_id,
+                context=context
+            ):
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            outcome = "disconnected"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            metrics.CHAT_STREAM_SECONDS.observe(time.perf_counter() - started, outcome)
+
+        # Fold turns that fell out of the window into the rolling summary
+        if context.done() and not context.exception() and context.result().history_messages:
+            schedule_summary_refresh(turn_conversation_id, context.result().history_messages[0].id)
 
     return StreamingResponse(
         event_generator(),
@@ -372,28 +544,86 @@ async def chat_stream(
     )
 
 
+def _encode_conversation_cursor(conversation: Conversation) -> str:
+    return f"{conversation.updated_at.isoformat()}_{conversation.id}"
+
+
+def _decode_conversation_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        updated_at, conversation_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(updated_at), int(conversation_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/conversations", response_model=List[ConversationRead])
 async def list_conversations(
+    response: Response,
+    before: Optional[str] = Query(None, description="X-Next-Cursor value of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=CONVERSATIONS_MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    """List all conversations for the current user."""
-    query = select(Conversation).where(
-        Conversation.user_id == current_user.id
-    ).order_by(Conversation.updated_at.desc())
+    """
+    List the current user's conversations, most recently updated first.
+    Paging is opt-in: without limit or before every conversation is returned.
+    """
+    query = select(Conversation).where(Conversation.user_id == current_user.id)
+    if limit is None and before is None:
+        return (await session.exec(
+            query.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        )).all()
+
+    limit = limit or CONVERSATIONS_PAGE_SIZE
+    if before is not None:
+        query = query.where(
+            tuple_(Conversation.updated_at, Conversation.id) < _decode_conversation_cursor(before)
+        )
+    query = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
 
-    conversations = session.exec(query).all()
+    # Fetch one extra row to learn whether another page exists
+    conversations = (await session.exec(query.limit(limit + 1))).all()
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        response.headers["X-Next-Cursor"] = _encode_conversation_cursor(conversations[-1])
     return conversations
 
 
+@router.delete("/conversations")
+async def delete_conversations_bulk(
+    older_than_days: Optional[int] = Query(default=None, ge=0),
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_write_session)
+):
+    """Delete all conversations of the current user, or only those idle for older_than_days."""
+    older_than = None
+    if older_than_days is not None:
+        older_than = datetime.utcnow() - timedelta(days=older_than_days)
+
+    await begin_write(session)
+    conversation_ids = await select_conversation_ids(
+        session, user_id=current_user.id, older_than=older_than
+    )
+    await delete_conversations(session, conversation_ids)
+    await session.commit()
+
+    return {"ok": True, "deleted": len(conversation_ids)}
+
+
 @router.get("/conversations/{conversation_id}", response_model=ConversationDetail)
 async def get_conversation(
     conversation_id: int,
+    before: Optional[int] = Query(None, description="Return messages older than this message ID"),
+    limit: Optional[int] = Query(None, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    """Get a specific conversation with all messages."""
-    conversation = session.get(Conversation, conversation_id)
+    """
+    Get a conversation with its messages. Paging is opt-in: with limit or
+    before, only the newest page (or the page older than before) is returned
+    and next_before pages further back.
+    """
+    conversation = await session.get(Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -401,11 +631,27 @@ async def get_conversation(
     if conversation.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    # Get all messages for this conversation
-    messages_query = select(Message).where(
+    # Read the newest page (or the page older than the cursor) backwards
+    messages_query = select(Message).options(defer(Message.tool_calls)).where(
         Message.conversation_id == conversation_id
-    ).order_by(Message.created_at)
-    messages = session.exec(messages_query).all()
+    )
+    if before is not None:
+        cursor = await session.get(Message, before)
+        if not cursor or cursor.conversation_id != conversation_id:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        messages_query = messages_query.where(
+            tuple_(Message.created_at, Message.id) < (cursor.created_at, cursor.id)
+        )
+    messages_query = messages_query.order_by(Message.created_at.desc(), Message.id.desc())
+    if limit is None and before is None:
+        messages = (await session.exec(messages_query)).all()
+        has_more = False
+    else:
+        limit = limit or MESSAGES_PAGE_SIZE
+        messages = (await session.exec(messages_query.limit(limit + 1))).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    messages = list(reversed(messages))
 
     return ConversationDetail(
         id=conversation.id,
@@ -422,18 +668,53 @@ async def get_conversation(
                 created_at=msg.created_at
             )
             for msg in messages
-        ]
+        ],
+        has_more=has_more,
+        next_before=messages[0].id if has_more else None
     )
 
 
+@router.get("/conversations/{conversation_id}/trace", response_model=List[TurnTraceRead])
+async def get_conversation_trace(
+    conversation_id: int,
+    before: Optional[int] = Query(None, description="Return traces of messages older than this message ID"),
+    limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Traces of the conversation's newest assistant turns, oldest first."""
+    conversation = await session.get(Conversation, conversation_id)
+
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    if conversation.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    query = select(Message.id, Message.created_at, Message.tool_calls).where(
+        Message.conversation_id == conversation_id,
+        Message.role == "assistant",
+        Message.tool_calls.is_not(None),
+    )
+    if before is not None:
+        query = query.where(Message.id < before)
+    rows = (await session.exec(query.order_by(Message.id.desc()).limit(limit))).all()
+
+    return [
+        TurnTraceRead(message_id=message_id, created_at=created_at, trace=json.loads(tool_calls))
+        for message_id, created_at, tool_calls in reversed(rows)
+    ]
+
+
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: int,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_write_session)
 ):
     """Delete a conversation and all its messages."""
-    conversation = session.get(Conversation, conversation_id)
+    await begin_write(session)
+    conversation = await session.get(Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -441,14 +722,7 @@ async def delete_conversation(
     if conversation.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    # Delete all messages first
-    messages_query = select(Message).where(Message.conversation_id == conversation_id)
-    messages = session.exec(messages_query).all()
-    for msg in messages:
-        session.delete(msg)
-
-    # Delete conversation
-    session.delete(conversation)
-    session.commit()
+    await delete_conversations(session, [conversation_id])
+    await session.commit()
 
     return {"ok": True, "message": "Conversation deleted"}
@@ -1,13 +1,35 @@
-from typing import List
+import os
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from database import get_session
+from database import begin_write, get_session, get_write_session
 from models import Todo, User
-from schemas import TodoCreate, TodoRead, TodoUpdate
+from schemas import (
+    TodoBulkCreate,
+    TodoBulkDelete,
+    TodoBulkUpdate,
+    TodoCreate,
+    TodoRead,
+    TodoUpdate,
+)
 from auth import get_current_active_user
+from bulk import (
+    check_batch_size,
+    create_todos,
+    delete_todos,
+    fetch_todos,
+    owned_completion,
+    set_todos_completed,
+    update_todos,
+)
+from stats import apply_task_delta
+
 
+TODOS_PAGE_SIZE = int(os.environ.get("TODOS_PAGE_SIZE", "200"))
+TODOS_MAX_PAGE_SIZE = int(os.environ.get("TODOS_MAX_PAGE_SIZE", "500"))
 
 router = APIRouter(
     prefix="/todos",
@@ -17,53 +39,142 @@ router = APIRouter(
 
 @router.get("", response_model=List[TodoRead])
 async def read_todos(
-    session: Session = Depends(get_session),
+    response: Response,
+    after: Optional[int] = Query(None, description="Return todos with an id greater than this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=TODOS_MAX_PAGE_SIZE),
+    completed: Optional[bool] = None,
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user),
 ):
-    todos = session.exec(select(Todo).where(Todo.user_id == current_user.id)).all()
+    """
+    List the user's todos in id order. Paging is opt-in: without limit or
+    after every todo is returned, as the UI pages expect; with either, pages
+    of limit (default TODOS_PAGE_SIZE) todos are returned and X-Next-Cursor
+    holds the after value of the next page.
+    """
+    query = select(Todo).where(Todo.user_id == current_user.id)
+    if completed is not None:
+        query = query.where(Todo.completed == completed)
+    if limit is None and after is None:
+        return (await session.exec(query.order_by(Todo.id))).all()
+
+    limit = limit or TODOS_PAGE_SIZE
+    if after is not None:
+        query = query.where(Todo.id > after)
+    # Fetch one extra row to learn whether another page exists
+    todos = (await session.exec(query.order_by(Todo.id).limit(limit + 1))).all()
+    if len(todos) > limit:
+        todos = todos[:limit]
+        response.headers["X-Next-Cursor"] = str(todos[-1].id)
     return todos
 
 
 @router.post("", response_model=TodoRead)
 async def create_todo(
     todo_create: TodoCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_write_session),
     current_user: User = Depends(get_current_active_user),
 ):
+    await begin_write(session)
     todo = Todo(content=todo_create.content, user_id=current_user.id)
     session.add(todo)
-    session.commit()
-    session.refresh(todo)
+    await apply_task_delta(session, current_user.id, total=1)
+    await session.commit()
+    await session.refresh(todo)
     return todo
 
 
+# Bulk routes are declared before the /{todo_id} routes so "bulk" is never
+# parsed as an ID.
+@router.post("/bulk", response_model=List[TodoRead])
+async def create_todos_bulk(
+    bulk_create: TodoBulkCreate,
+    session: AsyncSession = Depends(get_write_session),
+    current_user: User = Depends(get_current_active_user),
+):
+    error = check_batch_size(bulk_create.todos)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    await begin_write(session)
+    todos = await create_todos(
+        session, current_user.id, [todo.content for todo in bulk_create.todos]
+    )
+    await session.commit()
+    return todos
+
+
+@router.patch("/bulk", response_model=List[TodoRead])
+async def update_todos_bulk(
+    bulk_update: TodoBulkUpdate,
+    session: AsyncSession = Depends(get_write_session),
+    current_user: User = Depends(get_current_active_user),
+):
+    error = check_batch_size(bulk_update.todos)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    ids = [todo.id for todo in bulk_update.todos]
+    await begin_write(session)
+    owned = await owned_completion(session, current_user.id, ids)
+    missing = sorted(set(ids) - owned.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Todos not found: {missing}")
+    await update_todos(
+        session, current_user.id, [todo.model_dump() for todo in bulk_update.todos], owned
+    )
+    await session.commit()
+    return await fetch_todos(session, list(owned))
+
+
+@router.delete("/bulk")
+async def delete_todos_bulk(
+    bulk_delete: TodoBulkDelete,
+    session: AsyncSession = Depends(get_write_session),
+    current_user: User = Depends(get_current_active_user),
+):
+    error = check_batch_size(bulk_delete.ids)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    await begin_write(session)
+    owned = await owned_completion(session, current_user.id, bulk_delete.ids)
+    missing = sorted(set(bulk_delete.ids) - owned.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Todos not found: {missing}")
+    deleted = await delete_todos(session, current_user.id, list(owned))
+    await session.commit()
+    return {"ok": True, "deleted": deleted}
+
+
 @router.put("/{todo_id}", response_model=TodoRead)
 async def update_todo(
     todo_id: int,
     todo_update: TodoUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_write_session),
     current_user: User = Depends(get_current_active_user),
 ):
-    todo = session.get(Todo, todo_id)
+    await begin_write(session)
+    todo = await session.get(Todo, todo_id)
     if not todo or todo.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Todo not found")
     todo.content = todo_update.content
-    todo.completed = todo_update.completed
     session.add(todo)
-    session.commit()
-    session.refresh(todo)
+    await set_todos_completed(session, current_user.id, [todo.id], todo_update.completed)
+    await session.commit()
+    await session.refresh(todo)
     return todo
 
 
 @router.delete("/{todo_id}")
 async def delete_todo(
     todo_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_write_session),
     current_user: User = Depends(get_current_active_user),
 ):
-    todo = session.get(Todo, todo_id)
+    await begin_write(session)
+    todo = await session.get(Todo, todo_id)
     if not todo or todo.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Todo not found")
-    session.delete(todo)
-    session.commit()
+    if not await delete_todos(session, current_user.id, [todo.id]):
+        # Deleted by a concurrent request
+        raise HTTPException(status_code=404, detail="Todo not found")
+    await session.commit()
     return {"ok": True}
@@ -1,7 +1,8 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth import get_password_hash, get_current_active_user
 from database import get_session
@@ -14,11 +15,11 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=UserRead)
-async def create_user(user_create: UserCreate, session: Session = Depends(get_session)):
-    existing_user = session.exec(select(User).where(User.username == user_create.username)).first()
+async def create_user(user_create: UserCreate, session: AsyncSession = Depends(get_session)):
+    existing_user = (await session.exec(select(User).where(User.username == user_create.username))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user_create.password)
+    hashed_password = await get_password_hash(user_create.password)
     user = User(
         username=user_create.username,
         email=user_create.email,
@@ -26,18 +27,25 @@ async def create_user(user_create: UserCreate, session: Session = Depends(get_se
         hashed_password=hashed_password,
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
 @router.get("/me", response_model=UserRead)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
-    return current_user
+async def read_users_me(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    # The principal may be a claims-only snapshot; load the full profile
+    user = await session.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @router.get("/", response_model=List[UserRead])
 async def read_users(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
-    users = session.exec(select(User)).all()
+    users = (await session.exec(select(User))).all()
     return users
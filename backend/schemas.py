@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 
 from sqlmodel import SQLModel
@@ -44,6 +44,24 @@ class TodoUpdate(SQLModel):
     completed: bool
 
 
+class TodoBulkCreate(SQLModel):
+    todos: List[TodoCreate]
+
+
+class TodoBulkUpdateItem(SQLModel):
+    id: int
+    content: Optional[str] = None
+    completed: Optional[bool] = None
+
+
+class TodoBulkUpdate(SQLModel):
+    todos: List[TodoBulkUpdateItem]
+
+
+class TodoBulkDelete(SQLModel):
+    ids: List[int]
+
+
 # Chat schemas for Phase 3
 class ChatRequest(SQLModel):
     message: str
@@ -54,6 +72,7 @@ class ChatResponse(SQLModel):
     conversation_id: int
     message: str
     role: str = "assistant"
+    meta: Optional[Dict[str, Any]] = None
 
 
 class ConversationCreate(SQLModel):
@@ -76,6 +95,12 @@ class MessageRead(SQLModel):
     created_at: datetime
 
 
+class TurnTraceRead(SQLModel):
+    message_id: int
+    created_at: datetime
+    trace: dict
+
+
 class ConversationDetail(SQLModel):
     id: int
     user_id: int
@@ -83,3 +108,6 @@ class ConversationDetail(SQLModel):
     created_at: datetime
     updated_at: datetime
     messages: List[MessageRead] = []
+    # Set when older messages exist; pass next_before as ?before= to load them
+    has_more: bool = False
+    next_before: Optional[int] = None
@@ -0,0 +1,137 @@
+"""
+Server-Sent Event Frames
+Pre-encoded SSE frames and a writer that coalesces streamed tokens into few
+frames, flushing on a size or time threshold
+"""
+
+import asyncio
+import json
+import os
+from json.encoder import encode_basestring_ascii
+from typing import Any, AsyncIterator, List, Optional
+
+# Longest time a token may wait to be sent with the ones after it (0 sends every token at once)
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "20"))
+# Buffered text that is sent right away, whatever the time
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "1024"))
+
+# Byte-identical to json.dumps({"type": "content", "content": text}) framed as SSE
+_CONTENT_PREFIX = 'data: {"type": "content", "content": '
+_FRAME_SUFFIX = "}\n\n"
+_END = object()
+_DUE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def content_frame(text: str) -> str:
+    return _CONTENT_PREFIX + encode_basestring_ascii(text) + _FRAME_SUFFIX
+
+
+def event_frame(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class SSEWriter:
+    """
+    Turns streamed text into content frames.
+
+    Tokens are buffered while the source has more ready and are sent once it
+    goes quiet, at most one frame per coalescing window; a token arriving
+    after a quiet window goes out at once, so the first token is never
+    delayed. The full text is kept as a list and joined once.
+    """
+
+    def __init__(self, coalesce_ms: float = SSE_COALESCE_MS, max_chars: int = SSE_COALESCE_MAX_CHARS):
+        self.window = coalesce_ms / 1000
+        self.max_chars = max_chars
+        self._loop = asyncio.get_running_loop()
+        self._parts: List[str] = []
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._last_flush = float("-inf")
+        self.tokens = 0
+        self.frames = 0
+
+    def add(self, text: str) -> Optional[str]:
+        """Buffer a token; returns a frame when it has to be sent now."""
+        self._parts.append(text)
+        self.tokens += 1
+        if self.window <= 0:
+            self.frames += 1
+            return content_frame(text)
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self.max_chars:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Frame for everything buffered, or None when nothing is."""
+        self._last_flush = self._loop.time()
+        if not self._pending:
+            return None
+        text = self._pending[0] if len(self._pending) == 1 else "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        self.frames += 1
+        return content_frame(text)
+
+    def text(self, start: int = 0) -> str:
+        """All text added so far, or from the start-th token on."""
+        return "".join(self._parts[start:])
+
+    async def paced(self, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """
+        Iterate chunks, yielding None when buffered text is due; the caller
+        then sends flush(). Text added while iterating is only sent this way.
+        """
+        if self.window <= 0:
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        # The source is read by a separate task: cancelling a read of an
+        # HTTP stream halfway would break it, cancelling a queue get does not
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for chunk in chunks:
+                    queue.put_nowait(chunk)
+            except Exception as e:
+                queue.put_nowait(_Failure(e))
+            finally:
+                queue.put_nowait(_END)
+
+        reader = asyncio.create_task(pump())
+        # One timer per coalescing window, not per token, wakes the loop
+        # when buffered text is due
+        timer = None
+        try:
+            while True:
+                if self._pending and timer is None and queue.empty():
+                    wait = self._last_flush + self.window - self._loop.time()
+                    if wait <= 0:
+                        # Nothing more is ready and the window is over: send now
+                        yield None
+                        continue
+                    timer = self._loop.call_later(wait, queue.put_nowait, _DUE)
+                item = await queue.get()
+                if item is _DUE:
+                    timer = None
+                    if self._pending:
+                        yield None
+                    continue
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            reader.cancel()
+            if timer is not None:
+                timer.cancel()
@@ -0,0 +1,190 @@
+"""
+SSE Streaming Benchmark
+Serves simulated LLM token streams from an in-process uvicorn worker, once
+with a JSON frame per token (the old encoding) and once through
+sse.SSEWriter, to concurrent clients in a subprocess, and reports the
+worker's CPU time per streamed token, the frames and bytes sent, and the
+concurrent streams one worker could sustain at the given token rate
+
+Usage:
+    python sse_bench.py [--streams 200] [--tokens 400] [--token-rate 80] [--burst 4] [--coalesce-ms 20]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import uvicorn
+from openai.types.chat import ChatCompletionChunk
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from sse import SSEWriter
+
+SAMPLE = (
+    "Here are your tasks for today: buy milk, call the plumber about the kitchen sink, "
+    "finish the quarterly report and book a table for Friday. "
+)
+
+
+def make_chunks(count: int) -> list:
+    """Content chunks of a few characters each, like a tokenizer produces."""
+    words = SAMPLE.split(" ")
+    return [
+        ChatCompletionChunk.model_validate({
+            "id": "bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+            "choices": [{"index": 0, "delta": {"content": words[i % len(words)] + " "}, "finish_reason": None}],
+        })
+        for i in range(count)
+    ]
+
+
+async def source(chunks: list, burst: int, interval: float):
+    """Yield chunks the way they come off the network: a burst per read."""
+    for i, chunk in enumerate(chunks):
+        if i and i % burst == 0:
+            await asyncio.sleep(interval)
+        yield chunk
+
+
+async def drain(chunks, args):
+    """Consume the chunks and send only the final frame (the baseline)."""
+    count = 0
+    async for chunk in chunks:
+        count += len(chunk.choices[0].delta.content)
+    yield f"data: {json.dumps({'type': 'done', 'length': count})}\n\n"
+
+
+async def per_token(chunks, args):
+    """The encoding used before SSEWriter: a json.dumps frame per token."""
+    full_response = ""
+    async for chunk in chunks:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content = delta.content
+            full_response += content
+            yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+    yield f"data: {json.dumps({'type': 'done', 'length': len(full_response)})}\n\n"
+
+
+async def coalesced(chunks, args):
+    """The stream_agent_response loop with SSEWriter."""
+    writer = SSEWriter(args.coalesce_ms, args.max_chars)
+    async for chunk in writer.paced(chunks):
+        if chunk is None:
+            yield writer.flush()
+            continue
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            frame = writer.add(delta.content)
+            if frame:
+                yield frame
+    frame = writer.flush()
+    if frame:
+        yield frame
+    yield f"data: {json.dumps({'type': 'done', 'length': len(writer.text())})}\n\n"
+
+
+ENCODERS = {"source only": drain, "per-token json": per_token, "coalesced": coalesced}
+
+
+def build_app(args) -> Starlette:
+    chunks = make_chunks(args.tokens)
+    interval = args.burst / args.token_rate
+
+    async def stream(request):
+        encoder = ENCODERS[request.query_params["encoding"]]
+        return StreamingResponse(encoder(source(chunks, args.burst, interval), args),
+                                 media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/stream", stream)])
+
+
+async def read_stream(port: int, encoding: str) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    path = "/stream?encoding=" + encoding.replace(" ", "+")
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+    received = frames = 0
+    while data := await reader.read(65536):
+        received += len(data)
+        frames += data.count(b"data: ")
+    writer.close()
+    return received, frames
+
+
+async def run_client(args) -> None:
+    """Client side, in its own process so its CPU time is not counted."""
+    results = await asyncio.gather(*(read_stream(args.port, args.encoding) for _ in range(args.streams)))
+    print(json.dumps({"bytes": sum(r[0] for r in results) / len(results),
+                      "frames": sum(r[1] for r in results) / len(results)}))
+
+
+async def measure(args, encoding: str) -> dict:
+    client = await asyncio.create_subprocess_exec(
+        sys.executable, __file__, "--client", "--port", str(args.port), "--encoding", encoding,
+        "--streams", str(args.streams), stdout=subprocess.PIPE,
+    )
+    # The client's start-up happens before the first request arrives
+    cpu, wall = time.process_time(), time.perf_counter()
+    output, _ = await client.communicate()
+    return {"cpu_s": time.process_time() - cpu, "wall_s": time.perf_counter() - wall, **json.loads(output)}
+
+
+async def run_server(args) -> None:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        args.port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(build_app(args), port=args.port, log_level="warning",
+                                           backlog=4096))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    tokens = args.streams * args.tokens
+    try:
+        baseline = await measure(args, "source only")
+        results = {encoding: await measure(args, encoding) for encoding in ("per-token json", "coalesced")}
+    finally:
+        server.should_exit = True
+        await serving
+
+    print(f"{args.streams} concurrent streams x {args.tokens} tokens, {args.token_rate:g} tokens/s per stream "
+          f"in bursts of {args.burst}, coalescing window {args.coalesce_ms:g} ms")
+    print(f"baseline (requests and token source, no frames): {baseline['cpu_s'] / tokens * 1e6:.1f} us/token")
+    print(f"{'encoding':<16} {'us CPU/token':>13} {'frames/stream':>14} {'KB/stream':>10} "
+          f"{'wall s':>7} {'max streams/worker':>19}")
+    for encoding, result in results.items():
+        net = max(result["cpu_s"] - baseline["cpu_s"], 1e-9) / tokens
+        # Streams a fully busy worker keeps up with, counting the baseline too
+        per_token_s = result["cpu_s"] / tokens
+        capacity = 1 / (per_token_s * args.token_rate)
+        print(f"{encoding:<16} {net * 1e6:>13.1f} {result['frames']:>14.0f} {result['bytes'] / 1024:>10.1f} "
+              f"{result['wall_s']:>7.2f} {capacity:>19.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the CPU cost of streaming tokens as SSE")
+    parser.add_argument("--streams", type=int, default=200, help="concurrent streams")
+    parser.add_argument("--tokens", type=int, default=400, help="tokens per stream")
+    parser.add_argument("--token-rate", type=float, default=80, help="tokens per second per stream")
+    parser.add_argument("--burst", type=int, default=4, help="tokens that arrive together")
+    parser.add_argument("--coalesce-ms", type=float, default=20)
+    parser.add_argument("--max-chars", type=int, default=1024)
+    parser.add_argument("--client", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--encoding", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    asyncio.run(run_client(args) if args.client else run_server(args))
+
+
+if __name__ == "__main__":
+    main()
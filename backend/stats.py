@@ -0,0 +1,231 @@
+"""
+Task Statistics Service
+Per-user task counters, materialized in user_task_stats and maintained on every todo write
+
+Usage:
+    python stats.py reconcile [--check]
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import case, event, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_session, engine
+from models import Todo, UserTaskStats
+from response_cache import bump_task_state
+
+# Number of task titles included in summary previews
+PREVIEW_SIZE = 5
+# Users upserted per statement by the reconciliation command
+RECONCILE_CHUNK_SIZE = 500
+
+
+def _counts(total_tasks: int, completed_tasks: int) -> dict:
+    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    return {
+        "total_tasks": total_tasks,
+        "completed_tasks": completed_tasks,
+        "pending_tasks": total_tasks - completed_tasks,
+        "completion_rate": round(completion_rate, 1)
+    }
+
+
+async def count_tasks(session: AsyncSession, user_id: int) -> tuple:
+    """(total, completed) straight from the todo table in a single aggregate query."""
+    query = select(
+        func.count(Todo.id),
+        func.coalesce(func.sum(case((Todo.completed == True, 1), else_=0)), 0)
+    ).where(Todo.user_id == user_id)
+    return tuple((await session.exec(query)).one())
+
+
+async def get_task_counts(session: AsyncSession, user_id: int) -> dict:
+    """Total/completed/pending counts and completion rate, read from the materialized counters."""
+    # Select columns rather than the entity so a stale identity-map copy is never returned
+    query = select(UserTaskStats.total, UserTaskStats.completed).where(
+        UserTaskStats.user_id == user_id
+    )
+    row = (await session.exec(query)).first()
+    if row is None:
+        # Counters are created by the user's next write or by `stats.py reconcile`
+        row = await count_tasks(session, user_id)
+    return _counts(*row)
+
+
+async def get_task_previews(
+    session: AsyncSession,
+    user_id: int,
+    completed: bool,
+    limit: int = PREVIEW_SIZE
+) -> List[Todo]:
+    """The first few tasks with the given status, read with a LIMIT query."""
+    query = select(Todo).where(
+        Todo.user_id == user_id,
+        Todo.completed == completed
+    ).order_by(Todo.id).limit(limit)
+    return (await session.exec(query)).all()
+
+
+def _insert(session: AsyncSession, rows: List[dict]):
+    """INSERT of counter rows for the session's dialect, to add an ON CONFLICT clause to."""
+    dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(UserTaskStats).values(rows)
+
+
+def _upsert(session: AsyncSession, rows: List[dict]):
+    """INSERT ... ON CONFLICT (user_id) DO UPDATE for the session's dialect."""
+    statement = _insert(session, rows)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "total": statement.excluded.total,
+            "completed": statement.excluded.completed,
+            "pending": statement.excluded.pending,
+            "last_activity": statement.excluded.last_activity,
+        }
+    )
+
+
+async def rebuild_task_stats(session: AsyncSession, user_id: int) -> None:
+    """Recompute one user's counters from the todo table, in the caller's transaction."""
+    total, completed = await count_tasks(session, user_id)
+    await session.exec(_upsert(session, [{
+        "user_id": user_id,
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "last_activity": datetime.utcnow(),
+    }]))
+
+
+async def apply_task_delta(
+    session: AsyncSession,
+    user_id: int,
+    total: int = 0,
+    completed: int = 0
+) -> None:
+    """
+    Adjust a user's counters in the caller's transaction.
+
+    Call after staging the todo change and before committing, so the counters
+    commit (or roll back) together with it. A write with no count change still
+    refreshes last_activity.
+    """
+    # Make the pending todo change visible to a possible seeding below
+    await session.flush()
+    increment = (
+        update(UserTaskStats)
+        .where(UserTaskStats.user_id == user_id)
+        .values(
+            total=UserTaskStats.total + total,
+            completed=UserTaskStats.completed + completed,
+            pending=UserTaskStats.pending + (total - completed),
+            last_activity=datetime.utcnow()
+        )
+    )
+    result = await session.exec(increment)
+    if result.rowcount == 0:
+        # No counter row yet: create it as it stood before this change, unless
+        # a concurrent writer just did, then apply the delta on top as usual
+        before_total, before_completed = await count_tasks(session, user_id)
+        before_total -= total
+        before_completed -= completed
+        await session.exec(_insert(session, [{
+            "user_id": user_id,
+            "total": before_total,
+            "completed": before_completed,
+            "pending": before_total - before_completed,
+            "last_activity": datetime.utcnow(),
+        }]).on_conflict_do_nothing(index_elements=["user_id"]))
+        await session.exec(increment)
+
+    # Invalidate cached agent responses now, and again once the change is
+    # visible to other sessions (see _bump_committed_task_state)
+    bump_task_state(user_id)
+    session.info.setdefault("task_state_users", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_task_state(session):
+    for user_id in session.info.pop("task_state_users", ()):
+        bump_task_state(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_task_state_users(session):
+    session.info.pop("task_state_users", None)
+
+
+async def reconcile_task_stats(fix: bool = True) -> List[dict]:
+    """
+    Rebuild every user's counters in bulk and report drift.
+
+    Returns:
+        One entry per user whose stored counters differed from the todo table
+    """
+    async with async_session() as session:
+        actual_query = select(
+            Todo.user_id,
+            func.count(Todo.id),
+            func.coalesce(func.sum(case((Todo.completed == True, 1), else_=0)), 0)
+        ).where(Todo.user_id != None).group_by(Todo.user_id)
+        actual = {uid: (total, done) for uid, total, done in (await session.exec(actual_query)).all()}
+
+        stored_query = select(UserTaskStats.user_id, UserTaskStats.total, UserTaskStats.completed)
+        stored = {uid: (total, done) for uid, total, done in (await session.exec(stored_query)).all()}
+
+        drift = []
+        for uid in sorted(actual.keys() | stored.keys()):
+            expected = actual.get(uid, (0, 0))
+            found: Optional[tuple] = stored.get(uid)
+            if found != expected:
+                drift.append({"user_id": uid, "stored": found, "actual": expected})
+
+        if fix and drift:
+            now = datetime.utcnow()
+            rows = [
+                {
+                    "user_id": entry["user_id"],
+                    "total": entry["actual"][0],
+                    "completed": entry["actual"][1],
+                    "pending": entry["actual"][0] - entry["actual"][1],
+                    "last_activity": now,
+                }
+                for entry in drift
+            ]
+            # Chunked to stay below the bound-parameter limit of SQLite
+            for start in range(0, len(rows), RECONCILE_CHUNK_SIZE):
+                await session.exec(_upsert(session, rows[start:start + RECONCILE_CHUNK_SIZE]))
+            await session.commit()
+
+    return drift
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Maintain the materialized per-user task counters")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    reconcile = subcommands.add_parser("reconcile", help="rebuild counters and report drift")
+    reconcile.add_argument("--check", action="store_true", help="only report drift, change nothing")
+    args = parser.parse_args()
+
+    try:
+        drift = await reconcile_task_stats(fix=not args.check)
+    finally:
+        await engine.dispose()
+
+    for entry in drift:
+        print(f"user {entry['user_id']}: stored={entry['stored']} actual={entry['actual']}")
+    action = "found" if args.check else "fixed"
+    print(f"{len(drift)} drifting user(s) {action}")
+    if args.check and drift:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
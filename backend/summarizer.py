@@ -0,0 +1,182 @@
+"""
+Rolling Conversation Summaries
+Incrementally compacts turns that fell out of the history window into a stored summary
+"""
+
+import asyncio
+import os
+import re
+from datetime import datetime
+from typing import List, Optional, Protocol
+from sqlalchemy.orm import defer
+from sqlmodel import select
+
+from admission import LLM_BACKGROUND_WEIGHT, governor
+from database import async_session
+from models import ConversationSummary, Message
+from write_queue import run_write
+
+# Summarizer backend: "extractive" (default, offline), "llm" or "off"
+SUMMARIZER = os.getenv("SUMMARIZER", "extractive").lower()
+# Minimum number of unsummarized messages before a refresh is worth an LLM call
+SUMMARY_MIN_NEW_MESSAGES = int(os.getenv("SUMMARY_MIN_NEW_MESSAGES", "6"))
+# Messages folded into the summary per summarizer call
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "40"))
+# Upper bound on the stored summary, in characters
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "2000"))
+
+SUMMARY_PROMPT = f"""You maintain a running summary of a conversation between a user and a todo management assistant.
+Update the existing summary with the new messages. Keep facts the assistant may need later:
+tasks mentioned (with IDs), user preferences, decisions and open questions.
+Write at most a few short paragraphs, in the third person, without preamble,
+and keep the whole summary under {SUMMARY_MAX_CHARS} characters."""
+
+# Where a trimmed summary may start: after the end of a sentence or line
+_SENTENCE_END = re.compile(r"[.!?](?:\s+)|\n+")
+
+
+class Summarizer(Protocol):
+    async def summarize(self, previous_summary: str, messages: List[dict]) -> str:
+        ...
+
+
+class LLMSummarizer:
+    """Summarizes with a chat completion; pass a stub client to run offline."""
+
+    def __init__(self, client=None, model: Optional[str] = None):
+        self.client = client
+        self.model = model
+
+    async def summarize(self, previous_summary: str, messages: List[dict]) -> str:
+        import agent
+
+        client = self.client or agent.client
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        # Summaries are background work and get a smaller share of the LLM slots
+        async with governor.slot(None, weight=LLM_BACKGROUND_WEIGHT):
+            response = await client.chat.completions.create(
+                model=self.model or agent.MODEL,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {
+                        "role": "user",
+                        "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+                    },
+                ],
+            )
+        return (response.choices[0].message.content or previous_summary).strip()
+
+
+class ExtractiveSummarizer:
+    """Deterministic, LLM-free summarizer: keeps the first sentence of each turn."""
+
+    def __init__(self, max_chars_per_message: int = 160):
+        self.max_chars_per_message = max_chars_per_message
+
+    async def summarize(self, previous_summary: str, messages: List[dict]) -> str:
+        lines = [previous_summary] if previous_summary else []
+        for m in messages:
+            first_sentence = m["content"].strip().split("\n", 1)[0].split(". ", 1)[0]
+            lines.append(f"{m['role']}: {first_sentence[:self.max_chars_per_message]}")
+        return "\n".join(lines)
+
+
+_summarizer: Optional[Summarizer] = {
+    "llm": LLMSummarizer,
+    "extractive": ExtractiveSummarizer,
+}.get(SUMMARIZER, lambda: None)()
+
+# Conversations with a refresh in flight, and strong refs to their tasks
+_running: dict[int, asyncio.Task] = {}
+
+
+def set_summarizer(summarizer: Optional[Summarizer]) -> None:
+    """Replace the summarizer backend (None disables summaries)."""
+    global _summarizer
+    _summarizer = summarizer
+
+
+async def get_summary(session, conversation_id: int) -> Optional[str]:
+    """Return the stored summary text of a conversation, if any."""
+    summary = await session.get(ConversationSummary, conversation_id)
+    return summary.content if summary and summary.content else None
+
+
+def trim_summary(content: str, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """
+    Keep the newest max_chars of a summary, dropping older text from the
+    front at a sentence boundary, or failing that a word boundary.
+    """
+    content = content.strip()
+    if len(content) <= max_chars:
+        return content
+    cut = len(content) - max_chars
+    sentence = _SENTENCE_END.search(content, cut)
+    if sentence and sentence.end() - cut <= max_chars // 2:
+        return content[sentence.end():]
+    space = content.find(" ", cut)
+    return content[space + 1:] if space != -1 else content[cut:]
+
+
+async def refresh_summary(conversation_id: int, before_message_id: int) -> None:
+    """
+    Fold messages older than before_message_id into the conversation summary.
+
+    Only messages newer than the stored checkpoint are read, so each message is
+    summarized once no matter how often this runs. No connection is held
+    while the summarizer runs: each batch is read, summarized, then written
+    in its own write transaction.
+    """
+    if _summarizer is None:
+        return
+
+    while True:
+        async with async_session() as session:
+            stored = await session.get(ConversationSummary, conversation_id)
+            previous_summary = stored.content if stored else ""
+            checkpoint = stored.last_message_id if stored else 0
+            query = select(Message).options(defer(Message.tool_calls)).where(
+                Message.conversation_id == conversation_id,
+                Message.id > checkpoint,
+                Message.id < before_message_id
+            ).order_by(Message.id).limit(SUMMARY_BATCH_SIZE)
+            batch = [(m.id, m.role, m.content) for m in (await session.exec(query)).all()]
+        if len(batch) < SUMMARY_MIN_NEW_MESSAGES:
+            return
+
+        content = trim_summary(await _summarizer.summarize(
+            previous_summary,
+            [{"role": role, "content": content} for _, role, content in batch]
+        ))
+
+        async def write(session) -> bool:
+            summary = await session.get(ConversationSummary, conversation_id)
+            if summary is None:
+                summary = ConversationSummary(conversation_id=conversation_id)
+            elif summary.last_message_id != checkpoint:
+                # Another worker folded these messages in the meantime
+                return False
+            summary.content = content
+            summary.last_message_id = batch[-1][0]
+            summary.updated_at = datetime.utcnow()
+            session.add(summary)
+            return True
+
+        if not await run_write(write) or len(batch) < SUMMARY_BATCH_SIZE:
+            return
+
+
+def schedule_summary_refresh(conversation_id: int, before_message_id: int) -> None:
+    """Refresh a conversation summary in the background, once at a time."""
+    if _summarizer is None or conversation_id in _running:
+        return
+
+    async def run():
+        try:
+            await refresh_summary(conversation_id, before_message_id)
+        except Exception as e:
+            print(f"Error refreshing summary for conversation {conversation_id}: {str(e)}")
+        finally:
+            _running.pop(conversation_id, None)
+
+    _running[conversation_id] = asyncio.create_task(run())
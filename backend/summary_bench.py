@@ -0,0 +1,116 @@
+"""
+Task Summary Benchmark
+Seeds a scratch SQLite database with one user owning many todos and compares
+the latency and peak Python memory of building a task summary by loading
+every row (the original get_task_summary) against the stats service: the
+aggregate query (stats.count_tasks) and the materialized counters
+(stats.get_task_counts), each with the get_task_previews LIMIT queries
+
+Usage:
+    python summary_bench.py [--todos 100000] [--runs 20]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args) -> None:
+    # Imported here so the scratch DATABASE_URL set by main() applies
+    from sqlalchemy import insert
+    from sqlmodel import select
+
+    import stats
+    from database import async_session, create_db_and_tables, engine
+    from models import Todo, User
+
+    await create_db_and_tables()
+    started = time.perf_counter()
+    async with async_session() as session:
+        user = User(username="bench", email="bench@example.com", hashed_password="-")
+        session.add(user)
+        await session.flush()
+        user_id = user.id
+        for offset in range(0, args.todos, 10000):
+            rows = [
+                {"content": f"task {i}", "user_id": user_id, "completed": i % 3 == 0}
+                for i in range(offset, min(args.todos, offset + 10000))
+            ]
+            await session.exec(insert(Todo), params=rows)
+        await stats.rebuild_task_stats(session, user_id)
+        await session.commit()
+    print(f"seeded {args.todos} todos in {time.perf_counter() - started:.1f} s")
+
+    async def load_every_row(session):
+        todos = (await session.exec(select(Todo).where(Todo.user_id == user_id))).all()
+        total_tasks = len(todos)
+        completed_tasks = sum(1 for t in todos if t.completed)
+        return (
+            stats._counts(total_tasks, completed_tasks),
+            [t.content for t in todos if not t.completed][:stats.PREVIEW_SIZE],
+            [t.content for t in todos if t.completed][:stats.PREVIEW_SIZE],
+        )
+
+    async def previews(session):
+        return (
+            [t.content for t in await stats.get_task_previews(session, user_id, completed=False)],
+            [t.content for t in await stats.get_task_previews(session, user_id, completed=True)],
+        )
+
+    async def aggregate_query(session):
+        return (stats._counts(*await stats.count_tasks(session, user_id)), *await previews(session))
+
+    async def materialized_counters(session):
+        return (await stats.get_task_counts(session, user_id), *await previews(session))
+
+    variants = [
+        ("load every row", load_every_row),
+        ("aggregate query", aggregate_query),
+        ("counters table", materialized_counters),
+    ]
+    expected = None
+    print(f"{'summary':<16} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'peak KiB':>10}")
+    for name, build in variants:
+        timings = []
+        for _ in range(args.runs):
+            # A fresh session per run, like a tool call, so nothing is served from the identity map
+            async with async_session() as session:
+                started = time.perf_counter()
+                result = await build(session)
+                timings.append((time.perf_counter() - started) * 1000)
+        # Peak memory in a separate run: tracing slows allocations down
+        async with async_session() as session:
+            tracemalloc.start()
+            await build(session)
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        if expected is None:
+            expected = result
+        elif result != expected:
+            print(f"  {name} returned a different summary: {result}")
+        print(f"{name:<16} {percentile(timings, 0.50):>9.1f} {percentile(timings, 0.95):>9.1f} "
+              f"{statistics.mean(timings):>9.1f} {peak:>10.0f}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare task summary strategies on a large todo list")
+    parser.add_argument("--todos", type=int, default=100_000, help="todos of the benchmark user")
+    parser.add_argument("--runs", type=int, default=20, help="summaries built per strategy")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Todo Latency Under Streaming Benchmark
+Serves the API from an in-process uvicorn worker, with the LLM client
+replaced by a stand-in that streams tokens at a fixed pace, and measures the
+latency of concurrent /todos requests (list, create, update) on their own and
+again while /chat/stream streams are open. The load runs in a subprocess so
+its CPU time does not compete with the server's event loop
+
+Usage:
+    python todos_latency_bench.py [--streams 50] [--clients 10] [--duration 10] [--token-delay-ms 50]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPLY = "Here are a few ideas to get your week organized, one step at a time. " * 2
+
+
+class StandInCompletions:
+    """Streams a canned reply, token by token, without calling a provider."""
+
+    def __init__(self, latency_ms: float, token_delay_ms: float):
+        self.latency = latency_ms / 1000
+        self.token_delay = token_delay_ms / 1000
+
+    async def create(self, messages, stream=False, model=None, **kwargs):
+        from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+        await asyncio.sleep(self.latency)
+        base = {"id": "bench", "created": int(time.time()), "model": model or "bench"}
+        if not stream:
+            return ChatCompletion.model_validate({**base, "object": "chat.completion", "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": REPLY}},
+            ]})
+
+        async def chunks():
+            for token in REPLY.split(" "):
+                await asyncio.sleep(self.token_delay)
+                yield ChatCompletionChunk.model_validate({**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {"content": token + " "}, "finish_reason": None},
+                ]})
+
+        return chunks()
+
+
+class StandInLLM:
+    def __init__(self, latency_ms: float, token_delay_ms: float):
+        self.chat = self
+        self.completions = StandInCompletions(latency_ms, token_delay_ms)
+
+
+def percentiles(values: list) -> str:
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return (f"n={len(ordered):<6} p50={pick(0.50):8.1f} ms  p95={pick(0.95):8.1f} ms  "
+            f"p99={pick(0.99):8.1f} ms  max={ordered[-1]:8.1f} ms  mean={statistics.mean(ordered):7.1f} ms")
+
+
+# Load generator (runs in the subprocess)
+
+async def login(client: httpx.AsyncClient, username: str) -> dict:
+    await client.post("/auth/register", json={"username": username, "email": f"{username}@example.com",
+                                              "password": username})
+    response = await client.post("/auth/token", data={"username": username, "password": username})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def todo_client(client: httpx.AsyncClient, headers: dict, todo_ids: list, deadline: float,
+                      latencies: dict) -> None:
+    """Mix of reads and writes, like the todo list page: mostly listing."""
+    while time.perf_counter() < deadline:
+        operation = random.choices(("list", "create", "update"), weights=(6, 2, 2))[0]
+        started = time.perf_counter()
+        if operation == "list":
+            response = await client.get("/todos", headers=headers)
+        elif operation == "create":
+            response = await client.post("/todos", json={"content": "bench task"}, headers=headers)
+        else:
+            response = await client.put(f"/todos/{random.choice(todo_ids)}",
+                                        json={"content": "bench task", "completed": random.random() < 0.5},
+                                        headers=headers)
+        elapsed = (time.perf_counter() - started) * 1000
+        latencies["all"].append(elapsed)
+        latencies[operation].append(elapsed)
+        if response.status_code >= 400:
+            latencies["errors"] += 1
+
+
+async def stream_client(client: httpx.AsyncClient, headers: dict, deadline: float, counts: dict) -> None:
+    """Keeps one /chat/stream response open at a time until the deadline."""
+    while time.perf_counter() < deadline:
+        async with client.stream("POST", "/chat/stream", json={"message": "help me plan my week"},
+                                 headers=headers) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    counts["events"] += 1
+        counts["streams"] += 1
+
+
+async def measure(client: httpx.AsyncClient, args, todo_headers: dict, todo_ids: list,
+                  stream_headers: dict, streams: int) -> tuple:
+    latencies = {"all": [], "list": [], "create": [], "update": [], "errors": 0}
+    counts = {"streams": 0, "events": 0}
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(
+        *(todo_client(client, todo_headers, todo_ids, deadline, latencies) for _ in range(args.clients)),
+        *(stream_client(client, stream_headers, deadline, counts) for _ in range(streams)),
+    )
+    return latencies, counts
+
+
+def report(label: str, latencies: dict, counts: dict, duration: float) -> None:
+    print(f"{label}: {len(latencies['all']) / duration:.0f} todo requests/s, {latencies['errors']} errors, "
+          f"{counts['streams']} streams completed ({counts['events']} events)")
+    for operation in ("all", "list", "create", "update"):
+        if latencies[operation]:
+            print(f"  {operation:<7} {percentiles(latencies[operation])}")
+
+
+async def run_client(args) -> None:
+    limits = httpx.Limits(max_connections=args.streams + args.clients + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120, limits=limits) as client:
+        todo_headers = await login(client, "bench_todos")
+        stream_headers = await login(client, "bench_streams")
+        todo_ids = []
+        for i in range(args.todos):
+            response = await client.post("/todos", json={"content": f"task {i}"}, headers=todo_headers)
+            todo_ids.append(response.json()["id"])
+
+        report("todos alone", *await measure(client, args, todo_headers, todo_ids, stream_headers, 0),
+               args.duration)
+        report(f"todos with {args.streams} open streams",
+               *await measure(client, args, todo_headers, todo_ids, stream_headers, args.streams),
+               args.duration)
+
+
+# Server
+
+async def run_server(args) -> None:
+    import uvicorn
+
+    # Imported here so the scratch database and settings from main() apply
+    import agent
+    from main import app
+
+    agent.client = StandInLLM(args.llm_latency_ms, args.token_delay_ms)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        args.port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning", backlog=4096))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        client = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, "--client", "--port", str(args.port), "--streams", str(args.streams),
+            "--clients", str(args.clients), "--duration", str(args.duration), "--todos", str(args.todos),
+        )
+        await client.wait()
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /todos latency while chat streams are open")
+    parser.add_argument("--streams", type=int, default=50, help="concurrently open /chat/stream responses")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent /todos clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per phase")
+    parser.add_argument("--todos", type=int, default=200, help="todos of the benchmark user")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="delay before the first token")
+    parser.add_argument("--token-delay-ms", type=float, default=50, help="delay between streamed tokens")
+    parser.add_argument("--client", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.client:
+        asyncio.run(run_client(args))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        # The stand-in replaces the client; these only keep imports and
+        # optional features from getting in the way
+        for name, value in {"SECRET_KEY": "bench", "OPEN_ROUTER_KEY": "bench", "LLM_BACKEND": "fake",
+                            "RESPONSE_CACHE": "false", "SUMMARIZER": "off", "CHAT_USER_RATE": "0",
+                            "LLM_MAX_CONCURRENCY": str(max(args.streams, 1))}.items():
+            os.environ.setdefault(name, value)
+        asyncio.run(run_server(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Tool Registry for the Todo AI Agent
+Single definition of every tool, shared by the agent, the streaming chat endpoint and the MCP server
+"""
+
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class ToolArgumentError(ValueError):
+    """Raised when tool arguments do not match the tool's schema."""
+
+
+@dataclass
+class ToolSpec:
+    name: str
+    description: str
+    func: Callable[..., Awaitable[Any]]
+    parameters: Dict[str, dict] = field(default_factory=dict)
+    required: List[str] = field(default_factory=list)
+    read_only: bool = False
+
+    def json_schema(self, extra_properties: Optional[Dict[str, dict]] = None) -> dict:
+        properties = dict(extra_properties or {})
+        properties.update(self.parameters)
+        required = list(extra_properties or {}) + self.required
+        return {"type": "object", "properties": properties, "required": required}
+
+
+# Hook signature: (tool_name, elapsed_seconds, result)
+TimingHook = Callable[[str, float, Any], None]
+
+# Results of read-only tools for the agent turn running in this context, keyed
+# by (user_id, tool, arguments); values are tasks so concurrent identical
+# reads share one execution
+_read_cache: ContextVar[Optional[Dict[tuple, asyncio.Task]]] = ContextVar(
+    "tool_read_cache", default=None
+)
+
+_TRUE_STRINGS = {"true", "1", "yes"}
+_FALSE_STRINGS = {"false", "0", "no"}
+
+
+def _coerce(value: Any, schema: dict, path: str) -> Any:
+    """Coerce a JSON value onto a (small subset of) JSON schema."""
+    expected = schema.get("type")
+
+    if expected == "integer":
+        if isinstance(value, bool):
+            raise ToolArgumentError(f"'{path}' must be an integer")
+        if isinstance(value, int):
+            coerced = value
+        elif isinstance(value, float) and value.is_integer():
+            coerced = int(value)
+        elif isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            coerced = int(value.strip())
+        else:
+            raise ToolArgumentError(f"'{path}' must be an integer")
+    elif expected == "boolean":
+        if isinstance(value, bool):
+            coerced = value
+        elif isinstance(value, str) and value.strip().lower() in _TRUE_STRINGS | _FALSE_STRINGS:
+            coerced = value.strip().lower() in _TRUE_STRINGS
+        elif isinstance(value, int) and value in (0, 1):
+            coerced = bool(value)
+        else:
+            raise ToolArgumentError(f"'{path}' must be a boolean")
+    elif expected == "string":
+        if isinstance(value, (dict, list)):
+            raise ToolArgumentError(f"'{path}' must be a string")
+        coerced = value if isinstance(value, str) else str(value)
+    elif expected == "array":
+        if not isinstance(value, list):
+            raise ToolArgumentError(f"'{path}' must be an array")
+        item_schema = schema.get("items", {})
+        coerced = [_coerce(item, item_schema, f"{path}[{i}]") for i, item in enumerate(value)]
+    elif expected == "object":
+        if not isinstance(value, dict):
+            raise ToolArgumentError(f"'{path}' must be an object")
+        coerced = _coerce_object(value, schema, path)
+    else:
+        coerced = value
+
+    if "enum" in schema and coerced not in schema["enum"]:
+        raise ToolArgumentError(f"'{path}' must be one of {', '.join(map(str, schema['enum']))}")
+    return coerced
+
+
+def _coerce_object(arguments: dict, schema: dict, path: str = "") -> dict:
+    properties = schema.get("properties", {})
+    coerced = {}
+    for name, prop_schema in properties.items():
+        # Models sometimes send null for omitted optional arguments
+        if arguments.get(name) is None:
+            continue
+        coerced[name] = _coerce(arguments[name], prop_schema, f"{path}.{name}" if path else name)
+    missing = [name for name in schema.get("required", []) if name not in coerced]
+    if missing:
+        raise ToolArgumentError(f"Missing required argument(s): {', '.join(missing)}")
+    return coerced
+
+
+class ToolRegistry:
+    """Decorator-based registry with O(1) dispatch by tool name."""
+
+    def __init__(self):
+        self._tools: Dict[str, ToolSpec] = {}
+        self._timing_hooks: List[TimingHook] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def tool(
+        self,
+        description: str,
+        parameters: Optional[Dict[str, dict]] = None,
+        required: Optional[List[str]] = None,
+        read_only: bool = False,
+        name: Optional[str] = None
+    ):
+        """Register an async tool function taking user_id plus the given parameters."""
+        def decorator(func):
+            tool_name = name or func.__name__
+            self._tools[tool_name] = ToolSpec(
+                name=tool_name,
+                description=description,
+                func=func,
+                parameters=parameters or {},
+                required=required or [],
+                read_only=read_only,
+            )
+            return func
+        return decorator
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self._tools.get(name)
+
+    def is_read_only(self, name: str) -> bool:
+        spec = self._tools.get(name)
+        return spec is not None and spec.read_only
+
+    def add_timing_hook(self, hook: TimingHook) -> None:
+        """Call hook(tool_name, elapsed_seconds, result) after every tool call."""
+        self._timing_hooks.append(hook)
+
+    def openai_tools(self) -> List[dict]:
+        """Tool definitions for OpenAI function calling (user_id is injected server-side)."""
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": spec.name,
+                    "description": spec.description,
+                    "parameters": spec.json_schema()
+                }
+            }
+            for spec in self._tools.values()
+        ]
+
+    def mcp_tools(self) -> list:
+        """Tool definitions for the MCP server, where the caller passes user_id."""
+        from mcp.types import Tool
+
+        user_id_property = {"user_id": {"type": "string", "description": "The user ID"}}
+        return [
+            Tool(
+                name=spec.name,
+                description=spec.description,
+                inputSchema=spec.json_schema(user_id_property)
+            )
+            for spec in self._tools.values()
+        ]
+
+    @contextmanager
+    def read_cache(self):
+        """Cache read-only tool results until the block exits or a write tool runs."""
+        token = _read_cache.set({})
+        try:
+            yield
+        finally:
+            _read_cache.reset(token)
+
+    def coerce_arguments(self, name: str, arguments: Any) -> dict:
+        """
+        Validate arguments against a tool's schema, coercing loose JSON types.
+        Arguments a model sent as malformed JSON arrive as the raw string.
+        """
+        spec = self._tools[name]
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError as e:
+                raise ToolArgumentError(f"Arguments are not valid JSON: {e}")
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError("Arguments must be a JSON object")
+        return _coerce_object(arguments, spec.json_schema())
+
+    async def call(self, name: str, arguments: Any, user_id: Any) -> Any:
+        """Validate arguments and execute a tool on behalf of a user."""
+        spec = self._tools.get(name)
+        if spec is None:
+            return {"error": f"Unknown tool: {name}"}
+        try:
+            kwargs = self.coerce_arguments(name, arguments)
+        except ToolArgumentError as e:
+            return {"error": str(e)}
+
+        cache = _read_cache.get()
+        if cache is None:
+            return await self._invoke(spec, kwargs, user_id)
+
+        if not spec.read_only:
+            # Any write may change what the cached reads returned
+            cache.clear()
+            try:
+                return await self._invoke(spec, kwargs, user_id)
+            finally:
+                cache.clear()
+
+        key = (str(user_id), name, json.dumps(kwargs, sort_keys=True))
+        task = cache.get(key)
+        if task is not None:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            task = asyncio.ensure_future(self._invoke(spec, kwargs, user_id))
+            cache[key] = task
+        try:
+            # Shielded so one cancelled caller does not cancel the shared read
+            result = await asyncio.shield(task)
+        except Exception:
+            cache.pop(key, None)
+            raise
+        if isinstance(result, dict) and "error" in result:
+            # Do not pin transient failures for the rest of the turn
+            cache.pop(key, None)
+        return result
+
+    async def _invoke(self, spec: ToolSpec, kwargs: dict, user_id: Any) -> Any:
+        started = time.perf_counter()
+        result = await spec.func(user_id=str(user_id), **kwargs)
+        elapsed = time.perf_counter() - started
+        for hook in self._timing_hooks:
+            hook(spec.name, elapsed, result)
+        return result
+
+
+# Shared registry populated by the tool definitions in mcp_server
+registry = ToolRegistry()
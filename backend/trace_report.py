@@ -0,0 +1,197 @@
+"""
+Turn Trace Report
+Aggregates the traces stored with assistant messages (see turn_trace.py) into
+a latency breakdown, per-tool statistics and a list of the slowest turns
+
+Usage:
+    python trace_report.py [--days 7] [--conversation-id ID] [--top 10] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlmodel import select
+
+from database import async_session, engine
+from models import Message
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": round(statistics.mean(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+def describe_steps(trace: dict) -> str:
+    """One-line step sequence, e.g. 'llm 812ms (queue 40) > tools[list_tasks 4ms] > llm 630ms'."""
+    parts = []
+    for step in trace.get("steps", []):
+        if step["type"] == "llm":
+            queue = f" (queue {step['queue_ms']:.0f})" if step.get("queue_ms", 0) >= 1 else ""
+            parts.append(f"llm {step['ms']:.0f}ms{queue}")
+        else:
+            calls = ", ".join(f"{call['tool']} {call['ms']:.0f}ms" for call in step["calls"])
+            parts.append(f"tools[{calls}]")
+    return " > ".join(parts) or "-"
+
+
+async def load_traces(days: Optional[float], conversation_id: Optional[int]) -> List[dict]:
+    query = select(Message.id, Message.conversation_id, Message.created_at, Message.tool_calls).where(
+        Message.role == "assistant", Message.tool_calls.is_not(None)
+    )
+    if days:
+        query = query.where(Message.created_at >= datetime.utcnow() - timedelta(days=days))
+    if conversation_id is not None:
+        query = query.where(Message.conversation_id == conversation_id)
+
+    turns = []
+    async with async_session() as session:
+        result = await session.stream(query.execution_options(yield_per=1000))
+        async for message_id, conv_id, created_at, tool_calls in result:
+            try:
+                trace = json.loads(tool_calls)
+            except ValueError:
+                continue
+            if not isinstance(trace, dict) or "total_ms" not in trace:
+                continue
+            turns.append({"message_id": message_id, "conversation_id": conv_id,
+                          "created_at": created_at.isoformat(), "trace": trace})
+    return turns
+
+
+def build_report(turns: List[dict], top: int) -> dict:
+    sources = Counter(turn["trace"].get("source", "llm") for turn in turns)
+    totals, llm, tools, queue, other = [], [], [], [], []
+    ttft, llm_calls, prompt_tokens, completion_tokens = [], [], [], []
+    per_tool = defaultdict(lambda: {"ms": [], "errors": 0, "result_bytes": []})
+    errors = 0
+
+    for turn in turns:
+        trace = turn["trace"]
+        totals.append(trace["total_ms"])
+        llm.append(trace.get("llm_ms", 0.0))
+        tools.append(trace.get("tool_ms", 0.0))
+        turn_queue = sum(step.get("queue_ms", 0.0) for step in trace["steps"] if step["type"] == "llm")
+        queue.append(turn_queue)
+        # LLM step durations include their queue wait
+        other.append(max(0.0, trace["total_ms"] - trace.get("llm_ms", 0.0) - trace.get("tool_ms", 0.0)))
+        errors += "error" in trace
+
+        llm_steps = [step for step in trace["steps"] if step["type"] == "llm"]
+        if llm_steps:
+            llm_calls.append(len(llm_steps))
+            prompt_tokens.append(trace["tokens"]["prompt"])
+            completion_tokens.append(trace["tokens"]["completion"])
+            if "ttft_ms" in llm_steps[0]:
+                ttft.append(llm_steps[0]["ttft_ms"])
+        for step in trace["steps"]:
+            if step["type"] != "tools":
+                continue
+            for call in step["calls"]:
+                stats = per_tool[call["tool"]]
+                stats["ms"].append(call["ms"])
+                stats["result_bytes"].append(call.get("result_bytes", 0))
+                stats["errors"] += bool(call.get("error"))
+
+    slowest = sorted(turns, key=lambda turn: turn["trace"]["total_ms"], reverse=True)[:top]
+    return {
+        "turns": len(turns),
+        "sources": dict(sources),
+        "errors": errors,
+        "total_ms": summarize(totals),
+        "breakdown_mean_ms": {
+            "llm": round(statistics.mean(llm), 2) if llm else 0.0,
+            "llm_queue": round(statistics.mean(queue), 2) if queue else 0.0,
+            "tools": round(statistics.mean(tools), 2) if tools else 0.0,
+            "other": round(statistics.mean(other), 2) if other else 0.0,
+        },
+        "llm": {
+            "calls_per_turn": round(statistics.mean(llm_calls), 2) if llm_calls else 0.0,
+            "first_ttft_ms": summarize(ttft),
+            "prompt_tokens_per_turn": round(statistics.mean(prompt_tokens), 1) if prompt_tokens else 0.0,
+            "completion_tokens_per_turn": round(statistics.mean(completion_tokens), 1) if completion_tokens else 0.0,
+        },
+        "tools": {
+            name: {
+                **summarize(stats["ms"]),
+                "errors": stats["errors"],
+                "mean_result_bytes": round(statistics.mean(stats["result_bytes"])),
+            }
+            for name, stats in sorted(per_tool.items(), key=lambda item: -sum(item[1]["ms"]))
+        },
+        "slowest": [
+            {
+                "message_id": turn["message_id"],
+                "conversation_id": turn["conversation_id"],
+                "created_at": turn["created_at"],
+                "total_ms": turn["trace"]["total_ms"],
+                "steps": describe_steps(turn["trace"]),
+            }
+            for turn in slowest
+        ],
+    }
+
+
+def print_report(report: dict) -> None:
+    if not report["turns"]:
+        print("no traced turns found")
+        return
+    total = report["total_ms"]
+    print(f"turns: {report['turns']} {report['sources']}, errors: {report['errors']}")
+    print(f"turn latency ms: p50 {total['p50']}, p95 {total['p95']}, p99 {total['p99']}, max {total['max']}")
+    breakdown = report["breakdown_mean_ms"]
+    print(f"mean breakdown ms: llm {breakdown['llm']} (of which queued {breakdown['llm_queue']}), "
+          f"tools {breakdown['tools']}, other {breakdown['other']}")
+    llm = report["llm"]
+    print(f"llm: {llm['calls_per_turn']} calls/turn, first-token p50 {llm['first_ttft_ms']['p50']} ms "
+          f"p95 {llm['first_ttft_ms']['p95']} ms, tokens/turn {llm['prompt_tokens_per_turn']} prompt "
+          f"+ {llm['completion_tokens_per_turn']} completion")
+    if report["tools"]:
+        print("\ntool                        calls    p50 ms    p95 ms    max ms  errors  result B")
+        for name, stats in report["tools"].items():
+            print(f"{name:<26} {stats['count']:>7} {stats['p50']:>9} {stats['p95']:>9} {stats['max']:>9} "
+                  f"{stats['errors']:>7} {stats['mean_result_bytes']:>9}")
+    print("\nslowest turns:")
+    for turn in report["slowest"]:
+        print(f"  #{turn['message_id']} (conversation {turn['conversation_id']}, {turn['created_at']}) "
+              f"{turn['total_ms']:.0f} ms: {turn['steps']}")
+
+
+async def run(args) -> None:
+    turns = await load_traces(args.days, args.conversation_id)
+    report = build_report(turns, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate stored agent turn traces")
+    parser.add_argument("--days", type=float, default=None, help="only turns from the last N days")
+    parser.add_argument("--conversation-id", type=int, default=None, help="only turns of one conversation")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest turns to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
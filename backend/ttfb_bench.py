@@ -0,0 +1,141 @@
+"""
+Streaming Latency Benchmark
+Starts the API under uvicorn against the offline stand-in LLM and measures,
+for concurrent /chat/stream requests on conversations with history, the time
+to response headers, to the "start" event (TTFB) and to the first token
+
+Usage:
+    python ttfb_bench.py [--requests 200] [--concurrency 20] [--llm-latency-ms 300] [--history 20]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def percentiles(values):
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return f"p50 {pick(0.50):7.1f}  p95 {pick(0.95):7.1f}  p99 {pick(0.99):7.1f}  mean {statistics.mean(values):7.1f} ms"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def stream_turn(client: httpx.AsyncClient, headers: dict, conversation_id: int, message: str) -> dict:
+    timings = {}
+    started = time.perf_counter()
+    async with client.stream(
+        "POST", "/chat/stream", json={"message": message, "conversation_id": conversation_id}, headers=headers
+    ) as response:
+        timings["headers"] = (time.perf_counter() - started) * 1000
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            if '"type": "start"' in line:
+                timings.setdefault("start", elapsed)
+            elif '"type": "content"' in line:
+                timings.setdefault("first_token", elapsed)
+            elif '"type": "done"' in line or '"type": "error"' in line:
+                timings["done"] = elapsed
+    return timings
+
+
+async def run(args, base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await wait_until_up(client)
+        await client.post("/auth/register", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+        token = (await client.post("/auth/token", data={"username": "bench", "password": "bench"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # One conversation per concurrent client, each with some history
+        conversation_ids = []
+        for i in range(args.concurrency):
+            response = await client.post("/chat/", json={"message": f"hello from client {i}"}, headers=headers)
+            conversation_ids.append(response.json()["conversation_id"])
+            for _ in range(max(0, args.history // 2 - 1)):
+                await client.post("/chat/", json={"message": "hi again", "conversation_id": conversation_ids[-1]},
+                                  headers=headers)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(args.requests):
+            queue.put_nowait(i)
+        results = []
+
+        async def worker(conversation_id: int):
+            while not queue.empty():
+                queue.get_nowait()
+                results.append(await stream_turn(client, headers, conversation_id, "what can you do"))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(conversation_id) for conversation_id in conversation_ids))
+        wall = time.perf_counter() - started
+
+    print(f"{len(results)} streams, concurrency {args.concurrency}, {args.history} history messages, "
+          f"LLM latency {args.llm_latency_ms:.0f} ms, {len(results) / wall:.1f} streams/s")
+    for key, label in (("headers", "headers    "), ("start", "start (TTFB)"),
+                       ("first_token", "first token"), ("done", "done       ")):
+        values = [timing[key] for timing in results if key in timing]
+        if values:
+            print(f"{label}  {percentiles(values)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /chat/stream time to first byte")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--history", type=int, default=20, help="messages in each conversation before the run")
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            "LLM_BACKEND": "fake",
+            "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "RESPONSE_CACHE": "false",
+            "SUMMARIZER": "off",
+            "CHAT_USER_RATE": "0",
+            "SECRET_KEY": os.environ.get("SECRET_KEY", "bench"),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+        )
+        try:
+            asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
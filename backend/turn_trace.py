@@ -0,0 +1,109 @@
+"""
+Agent Turn Traces
+Compact per-turn record of LLM calls and tool rounds (latencies, queue waits,
+token counts, tool arguments and result sizes), stored as JSON in
+Message.tool_calls of the assistant message
+"""
+
+import json
+import os
+import time
+from typing import Any, List, Optional
+
+# Persist a trace with every assistant message
+TURN_TRACES = os.getenv("TURN_TRACES", "true").lower() in ("1", "true", "yes")
+# Longer string arguments are truncated in the stored trace
+TRACE_MAX_ARG_CHARS = int(os.getenv("TRACE_MAX_ARG_CHARS", "200"))
+
+TRACE_VERSION = 1
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def _compact_arguments(arguments: Any) -> Any:
+    if isinstance(arguments, dict):
+        return {key: _compact_arguments(value) for key, value in arguments.items()}
+    if isinstance(arguments, list):
+        return [_compact_arguments(value) for value in arguments]
+    if isinstance(arguments, str) and len(arguments) > TRACE_MAX_ARG_CHARS:
+        return arguments[:TRACE_MAX_ARG_CHARS] + "…"
+    return arguments
+
+
+class TurnTrace:
+    """Collects the steps of one agent turn; create it when the turn starts."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.source = "llm"
+        self.started = time.perf_counter()
+        self.steps: List[dict] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.error: Optional[str] = None
+
+    def add_llm_call(
+        self,
+        started: float,
+        queue_ms: float = 0.0,
+        usage: Any = None,
+        finish_reason: Optional[str] = None,
+        first_token_at: Optional[float] = None,
+    ) -> None:
+        """Record a completion that was requested at perf_counter() time started."""
+        step = {"type": "llm", "ms": _ms(time.perf_counter() - started), "queue_ms": round(queue_ms, 2)}
+        if first_token_at is not None:
+            step["ttft_ms"] = _ms(first_token_at - started)
+        if usage is not None:
+            step["prompt_tokens"] = getattr(usage, "prompt_tokens", 0) or 0
+            step["completion_tokens"] = getattr(usage, "completion_tokens", 0) or 0
+            self.prompt_tokens += step["prompt_tokens"]
+            self.completion_tokens += step["completion_tokens"]
+        if finish_reason:
+            step["finish"] = finish_reason
+        self.steps.append(step)
+
+    def add_tool_round(self, calls: List[tuple], results: List[Any], round_timing: dict) -> None:
+        """Record a round from execute_tool_calls: the calls, their results and its timing."""
+        tools = []
+        for (tool_name, arguments), result, timing in zip(calls, results, round_timing["tools"]):
+            entry = {
+                "tool": tool_name,
+                "args": _compact_arguments(arguments),
+                "ms": timing["ms"],
+                "result_bytes": len(json.dumps(result)),
+            }
+            if isinstance(result, dict) and "error" in result:
+                entry["error"] = True
+            tools.append(entry)
+        self.steps.append({
+            "type": "tools",
+            "ms": round_timing["wall_ms"],
+            "batches": round_timing["batches"],
+            "calls": tools,
+        })
+
+    def to_dict(self) -> dict:
+        llm_ms = sum(step["ms"] for step in self.steps if step["type"] == "llm")
+        tool_ms = sum(step["ms"] for step in self.steps if step["type"] == "tools")
+        trace = {
+            "v": TRACE_VERSION,
+            "model": self.model if any(step["type"] == "llm" for step in self.steps) else None,
+            "source": self.source,
+            "total_ms": _ms(time.perf_counter() - self.started),
+            "llm_ms": round(llm_ms, 2),
+            "tool_ms": round(tool_ms, 2),
+            "tokens": {"prompt": self.prompt_tokens, "completion": self.completion_tokens},
+            "steps": self.steps,
+        }
+        if self.error:
+            trace["error"] = self.error[:200]
+        return trace
+
+    def to_json(self) -> Optional[str]:
+        """Serialized trace for Message.tool_calls, or None when tracing is off."""
+        if not TURN_TRACES:
+            return None
+        return json.dumps(self.to_dict(), separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,131 @@
+"""
+Serialized Write Queue
+Funnels database writes through one writer task that group-commits them, so
+concurrent requests never contend for SQLite's single write lock
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import IS_SQLITE, SQLITE_TUNING, async_session, begin_write, tool_session
+
+# Route writes through the queue; defaults to on with the SQLite production profile
+WRITE_QUEUE = os.getenv(
+    "WRITE_QUEUE", "true" if IS_SQLITE and SQLITE_TUNING else "false"
+).lower() in ("1", "true", "yes")
+# Maximum number of write jobs committed together
+WRITE_QUEUE_BATCH_SIZE = int(os.getenv("WRITE_QUEUE_BATCH_SIZE", "64"))
+
+# A write job stages changes on the session it is given and returns a result;
+# it must not commit. Flush (or call apply_task_delta) to obtain generated IDs.
+WriteJob = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class WriteQueue:
+    """Single-writer queue committing each drained batch of jobs in one transaction."""
+
+    def __init__(self, session_factory=async_session, batch_size: int = WRITE_QUEUE_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches = 0
+        self.jobs = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, job: WriteJob) -> Any:
+        """Run a write job in the next group commit and return its result once durable."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            # Everything that queued up during the previous commit joins this one
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch: List[Tuple[WriteJob, asyncio.Future]]) -> None:
+        outcomes = []
+        try:
+            async with self.session_factory() as session:
+                await begin_write(session)
+                for job, future in batch:
+                    if future.cancelled():
+                        continue
+                    try:
+                        # A failing job only rolls back its own savepoint
+                        async with session.begin_nested():
+                            outcomes.append((future, await job(session), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                await session.commit()
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.jobs += len(outcomes)
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Stop the writer task; call after in-flight requests have finished."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": WRITE_QUEUE,
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+write_queue = WriteQueue()
+
+
+async def run_write(job: WriteJob) -> Any:
+    """
+    Execute a write job and commit it.
+
+    With WRITE_QUEUE on, the job is group-committed by the shared writer task;
+    otherwise it runs in its own transaction.
+    """
+    if WRITE_QUEUE:
+        return await write_queue.submit(job)
+    # Inside an agent turn this reuses the turn's session (see tool_session)
+    async with tool_session() as session:
+        try:
+            await begin_write(session)
+            result = await job(session)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return result
@@ -340,6 +340,14 @@ export default function ChatPage() {
                   setActiveConversation(newConv);
                   setConversations(prev => [newConv, ...prev]);
                 }
+              } else if (data.type === "queued") {
+                if (!currentContent) {
+                  setMessages(prev => prev.map(msg =>
+                    msg.id === tempAssistantId
+                      ? { ...msg, content: `Waiting for a free slot (position ${data.position})...` }
+                      : msg
+                  ));
+                }
               } else if (data.type === "content") {
                 currentContent += data.content;
                 setMessages(prev => prev.map(msg =>